@@ -0,0 +1,582 @@
+import re
+import json
+import time
+import random
+import argparse
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+TEMPLATE_FILE = "data/hemvarn_course_templates_enriched.json"
+EVENT_FILE = "data/hemvarn_course_events.json"
+# Member data; both files are git-ignored
+APPLICATION_FILE = "data/applications.json"
+OUTPUT_FILE = "data/allocations.json"
+
+# Each round bans the edges behind double bookings and solves again
+MAX_CONFLICT_ROUNDS = 10
+
+# ============================================================
+# MIN-COST FLOW
+# ============================================================
+
+class MinCostFlow:
+    """
+    Primal-dual min-cost max-flow for small non-negative integer costs.
+
+    Each phase finds shortest distances on reduced costs with Dial's bucket
+    queue (costs are choice ranks, so distances are small integers), updates
+    the node potentials, and then saturates the zero-reduced-cost subgraph
+    with Dinic-style blocking flows. Edges live in flat lists; an edge e and
+    its residual twin are e and e ^ 1.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.adj = [[] for _ in range(n)]
+        self.to = []
+        self.cap = []
+        self.cost = []
+        self.phases = 0
+
+    def add_edge(self, u, v, cap, cost):
+        e = len(self.to)
+        self.to += (v, u)
+        self.cap += (cap, 0)
+        self.cost += (cost, -cost)
+        self.adj[u].append(e)
+        self.adj[v].append(e + 1)
+        return e
+
+    def flow(self, e):
+        return self.cap[e ^ 1]
+
+    def _shortest_distances(self, s, t, pot):
+        n, adj, to, cap, cost = self.n, self.adj, self.to, self.cap, self.cost
+        inf = float("inf")
+        dist = [inf] * n
+        dist[s] = 0
+        buckets = [[s]]
+        d = 0
+
+        while d < len(buckets):
+            # Nodes further away than t are not needed for the potentials
+            if d > dist[t]:
+                break
+            # Items appended to the current bucket (zero-cost edges) are
+            # still visited by this loop
+            for u in buckets[d]:
+                if dist[u] != d:
+                    continue
+                base = d + pot[u]
+                for e in adj[u]:
+                    if cap[e]:
+                        v = to[e]
+                        nd = base + cost[e] - pot[v]
+                        if nd < dist[v]:
+                            dist[v] = nd
+                            while len(buckets) <= nd:
+                                buckets.append([])
+                            buckets[nd].append(v)
+            d += 1
+
+        return dist
+
+    def _blocking_flows(self, s, t, pot):
+        n, adj, to, cap, cost = self.n, self.adj, self.to, self.cap, self.cost
+        pushed = 0
+
+        while True:
+            # Layered graph of admissible (zero reduced cost) residual edges,
+            # collected while assigning BFS levels
+            level = [-1] * n
+            level[s] = 0
+            layer = [None] * n
+            queue = [s]
+            for u in queue:
+                # Nodes as far away as t cannot lie on a shortest path to it
+                if 0 <= level[t] <= level[u]:
+                    break
+                next_level = level[u] + 1
+                pu = pot[u]
+                edges = []
+                for e in adj[u]:
+                    if cap[e]:
+                        v = to[e]
+                        if cost[e] + pu == pot[v]:
+                            if level[v] < 0:
+                                level[v] = next_level
+                                queue.append(v)
+                                edges.append(e)
+                            elif level[v] == next_level:
+                                edges.append(e)
+                layer[u] = edges
+            if level[t] < 0:
+                return pushed
+
+            current = [0] * n
+            path = []
+            u = s
+            while True:
+                if u == t:
+                    f = min(cap[e] for e in path)
+                    for e in path:
+                        cap[e] -= f
+                        cap[e ^ 1] += f
+                    pushed += f
+                    path = []
+                    u = s
+                    continue
+
+                edges = layer[u] or ()
+                i = current[u]
+                count = len(edges)
+                while i < count and not (cap[edges[i]] and level[to[edges[i]]] >= 0):
+                    i += 1
+                current[u] = i
+
+                if i < count:
+                    path.append(edges[i])
+                    u = to[edges[i]]
+                elif u == s:
+                    break
+                else:
+                    # Dead end: never enter u again in this round
+                    level[u] = -1
+                    e = path.pop()
+                    u = to[e ^ 1]
+                    current[u] += 1
+
+    def solve(self, s, t):
+        """
+        Maximum flow from s to t, and among maximum flows one of least cost.
+        Returns (flow, cost).
+        """
+        pot = [0] * self.n
+        total = 0
+
+        while True:
+            dist = self._shortest_distances(s, t, pot)
+            dt = dist[t]
+            if dt == float("inf"):
+                break
+            for v in range(self.n):
+                pot[v] += dist[v] if dist[v] < dt else dt
+            total += self._blocking_flows(s, t, pot)
+            self.phases += 1
+
+        cost = sum(self.cost[e] * self.cap[e ^ 1] for e in range(0, len(self.to), 2))
+        return total, cost
+
+# ============================================================
+# ELIGIBILITY
+# ============================================================
+
+def template_closure(templates):
+    """
+    template id -> ids a member counts as having completed when they have
+    completed it: itself and the base templates a merged course covers,
+    recursively.
+    """
+    by_id = {t["id"]: t for t in templates}
+    closure = {}
+
+    def covered(template_id, seen=()):
+        if template_id in closure:
+            return closure[template_id]
+        ids = {template_id}
+        for base in by_id.get(template_id, {}).get("baseTemplateIds") or []:
+            if base not in seen:
+                ids |= covered(base, seen + (template_id,))
+        closure[template_id] = ids
+        return ids
+
+    for t in templates:
+        covered(t["id"])
+    return closure
+
+def completed_ids(completed, closure, merged):
+    """
+    Everything a member's completed courses count for, including merged
+    courses whose base courses have all been completed.
+    """
+    done = set()
+    for template_id in completed:
+        done |= closure.get(template_id, {template_id})
+    for template_id, bases in merged.items():
+        if bases <= done:
+            done.add(template_id)
+    return done
+
+ALTERNATIVES = re.compile(r",|\s(?:eller|alternativt)\s", re.IGNORECASE)
+# "plutonchefskurs 1 för troppchefer", "För kompanikvartermästare: ..."
+ROLE_SCOPED = re.compile(r"\bför\s+\w*(?:chef|chefer|mästare)\b", re.IGNORECASE)
+
+def prerequisite_clauses(templates):
+    """
+    template id -> list of sets of template ids. Each prerequisite line that
+    names known courses becomes one clause, met by completing any course it
+    names ("kompanichefskurs 2 eller kompanistridskurs"); all clauses must
+    be met. Lines with alternatives that are not courses here (fysisk
+    status, VPL, "eller motsvarande", ...) cannot be checked and are left to
+    the course organizer.
+
+    Lines scoped to a role ("... för troppchefer", "... för gruppchefer")
+    are requirements for different applicants, and applications do not say
+    which role a member has: together they form one clause met by any of
+    them. A lone role-scoped line does not apply to everyone and is skipped.
+    """
+    aliases = {}
+    for t in templates:
+        for alias in (t.get("courseCode"), t.get("shortName"), t["name"]):
+            if alias and len(alias) >= 3:
+                aliases.setdefault(alias.lower(), set()).add(t["id"])
+
+    # An empty alternation would match "" everywhere
+    if not aliases:
+        return {t["id"]: [] for t in templates}
+
+    pattern = re.compile(
+        r"(?<!\w)(" + "|".join(re.escape(a) for a in sorted(aliases, key=len, reverse=True)) + r")(?!\w)",
+        re.IGNORECASE,
+    )
+
+    clauses = {}
+    for t in templates:
+        own = {t["id"]} | set(t.get("baseTemplateIds") or [])
+        template_clauses = []
+        role_ids = []
+        for line in t.get("prerequisites") or []:
+            if "motsvarande" in line.lower():
+                continue
+            ids = set()
+            checkable = True
+            for part in ALTERNATIVES.split(line):
+                found = {i for m in pattern.finditer(part) for i in aliases[m.group().lower()]}
+                # "VPL, GMU, GU eller GU-F": an alternative that is not a
+                # course here makes the whole line uncheckable
+                if not found and part.strip(" .()"):
+                    checkable = False
+                ids |= found
+            ids -= own
+            if ROLE_SCOPED.search(line):
+                role_ids.append(ids if checkable else set())
+            elif checkable and ids:
+                template_clauses.append(ids)
+        # If one role's line cannot be checked, that role is unchecked and so
+        # is the clause
+        if len(role_ids) > 1 and all(role_ids):
+            template_clauses.append(set().union(*role_ids))
+        clauses[t["id"]] = template_clauses
+    return clauses
+
+# ============================================================
+# DATES
+# ============================================================
+
+def event_ranges(event):
+    return [
+        (d["start"], d["end"])
+        for d in event.get("courseDates") or []
+        if d.get("start") and d.get("end")
+    ]
+
+def overlaps(a, b):
+    # YYYYMMDD strings compare like dates
+    return any(s1 <= e2 and s2 <= e1 for s1, e1 in a for s2, e2 in b)
+
+# ============================================================
+# ALLOCATION
+# ============================================================
+
+def event_spots(event, default_spots):
+    spots = event.get("spots")
+    return default_spots if spots is None else spots
+
+def ineligibility(app, event, done, clauses, round_date, default_spots):
+    """
+    Why app cannot get a seat at event, or None if it can.
+    """
+    if event.get("status") not in (None, "open"):
+        return "closed"
+    if not event_spots(event, default_spots):
+        return "no spots"
+    submitted = app.get("submitted") or round_date
+    deadline = event.get("applicationDeadline")
+    if deadline and submitted > deadline:
+        return "after deadline"
+    if event["templateId"] in done:
+        return "already completed"
+    for clause in clauses.get(event["templateId"], []):
+        if not clause & done:
+            return "prerequisites"
+    return None
+
+def allocate(applications, events, templates, round_date=None, default_spots=None):
+    """
+    Assigns seats for a batch of applications, each
+    {"member", "choices": [event ids, best first], "completed": [template
+    ids], "seats": 1, "submitted": "YYYYMMDD"}.
+
+    Seats are given so that as many as possible are filled and, among those
+    allocations, choices are ranked as high as possible, subject to event
+    capacity (spots, or default_spots when unknown), eligibility and no
+    member holding overlapping courses or the same course twice.
+
+    Ranks in the result are 1-based: rank 1 is a member's first choice.
+    """
+    started = time.monotonic()
+    round_date = round_date or date.today().strftime("%Y%m%d")
+
+    events_by_id = {e["id"]: e for e in events}
+    closure = template_closure(templates)
+    merged = {t["id"]: set(t["baseTemplateIds"]) for t in templates if t.get("baseTemplateIds")}
+    clauses = prerequisite_clauses(templates)
+
+    # (application index, event id, rank) for every eligible choice
+    candidates = []
+    rejected = Counter()
+
+    for i, app in enumerate(applications):
+        done = completed_ids(app.get("completed") or [], closure, merged)
+        seen = set()
+        for rank, event_id in enumerate(app.get("choices") or []):
+            if event_id in seen:
+                continue
+            seen.add(event_id)
+            event = events_by_id.get(event_id)
+            reason = "unknown event" if event is None else ineligibility(
+                app, event, done, clauses, round_date, default_spots
+            )
+            if reason:
+                rejected[reason] += 1
+            else:
+                candidates.append((i, event_id, rank))
+
+    ranges = {e["id"]: event_ranges(e) for e in events}
+    banned = set()
+    rounds = 0
+
+    while True:
+        rounds += 1
+        assigned, phases = solve(applications, events_by_id, candidates, banned, default_spots)
+
+        conflicts = find_conflicts(assigned, ranges)
+        if not conflicts or rounds >= MAX_CONFLICT_ROUNDS:
+            break
+        banned |= conflicts
+
+    # Out of rounds: give up the worse-ranked of any overlapping seats
+    # rather than hand out courses a member cannot attend together
+    for i, event_id in conflicts:
+        assigned[i] = [c for c in assigned[i] if c[0] != event_id]
+        if not assigned[i]:
+            del assigned[i]
+
+    allocations = []
+    by_rank = Counter()
+    for i, choices in sorted(assigned.items()):
+        for event_id, rank in choices:
+            allocations.append({"member": applications[i]["member"], "eventId": event_id, "rank": rank + 1})
+            by_rank[rank + 1] += 1
+
+    unassigned = [app["member"] for i, app in enumerate(applications) if i not in assigned]
+    filled = Counter(a["eventId"] for a in allocations)
+
+    return {
+        "allocations": allocations,
+        "unassigned": unassigned,
+        "events": {
+            event_id: {"spots": event_spots(events_by_id[event_id], default_spots), "filled": n}
+            for event_id, n in sorted(filled.items())
+        },
+        "stats": {
+            "applications": len(applications),
+            "eligibleChoices": len(candidates),
+            "rejectedChoices": dict(rejected),
+            "assigned": len(allocations),
+            "byRank": {str(r): n for r, n in sorted(by_rank.items())},
+            "unassigned": len(unassigned),
+            "conflictRounds": rounds,
+            "droppedConflicts": len(conflicts),
+            "phases": phases,
+            "seconds": round(time.monotonic() - started, 3),
+        },
+    }
+
+def solve(applications, events_by_id, candidates, banned, default_spots):
+    """
+    One min-cost flow: source -> application (seats) -> event (1 per choice,
+    cost = rank) -> sink (spots). Alternative dates of the same course, for
+    members asking for more than one seat, go through a shared node of
+    capacity 1 so the member cannot get that course twice. Returns
+    ({application index: [(event id, rank)]}, phases).
+    """
+    choices = [c for c in candidates if (c[0], c[1]) not in banned]
+
+    event_ids = sorted({event_id for _, event_id, _ in choices})
+    n_apps = len(applications)
+    event_node = {event_id: n_apps + k for k, event_id in enumerate(event_ids)}
+    source = n_apps + len(event_ids)
+    sink = source + 1
+
+    per_course = Counter(
+        (i, events_by_id[event_id]["templateId"])
+        for i, event_id, _ in choices
+        if applications[i].get("seats", 1) > 1
+    )
+    group_node = {}
+    for key, count in per_course.items():
+        if count > 1:
+            group_node[key] = sink + 1 + len(group_node)
+
+    flow = MinCostFlow(sink + 1 + len(group_node))
+
+    for i, app in enumerate(applications):
+        flow.add_edge(source, i, app.get("seats", 1), 0)
+    for (i, _), node in group_node.items():
+        flow.add_edge(i, node, 1, 0)
+
+    choice_edges = []
+    for i, event_id, rank in choices:
+        u = group_node.get((i, events_by_id[event_id]["templateId"]), i)
+        choice_edges.append((flow.add_edge(u, event_node[event_id], 1, rank), i, event_id, rank))
+
+    for event_id in event_ids:
+        flow.add_edge(event_node[event_id], sink, event_spots(events_by_id[event_id], default_spots), 0)
+
+    flow.solve(source, sink)
+
+    assigned = {}
+    for e, i, event_id, rank in choice_edges:
+        if flow.flow(e):
+            assigned.setdefault(i, []).append((event_id, rank))
+    return assigned, flow.phases
+
+def find_conflicts(assigned, ranges):
+    """
+    (application index, event id) pairs to ban: for members holding several
+    seats, every seat that overlaps in time with a better-ranked one.
+    """
+    conflicts = set()
+    for i, choices in assigned.items():
+        if len(choices) < 2:
+            continue
+        kept = []
+        for event_id, rank in sorted(choices, key=lambda c: c[1]):
+            if any(overlaps(ranges[event_id], ranges[k]) for k in kept):
+                conflicts.add((i, event_id))
+            else:
+                kept.append(event_id)
+    return conflicts
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def synthetic_round(n_applications, templates, seed=1):
+    """
+    A region-wide round: about one event per 20 applications over a year,
+    with popular courses, prerequisite chains from the real templates and
+    one member in ten asking for two seats.
+    """
+    rng = random.Random(seed)
+    template_ids = [t["id"] for t in templates]
+    popularity = [1 / (k + 1) for k in range(len(template_ids))]
+    year = date(2026, 1, 1)
+
+    events = []
+    for k in range(max(1, n_applications // 20)):
+        template_id = rng.choices(template_ids, popularity)[0]
+        start = year + timedelta(days=rng.randrange(365))
+        end = start + timedelta(days=rng.choice([1, 2, 4, 9]))
+        events.append({
+            "id": f"evt-{template_id}-{k}",
+            "templateId": template_id,
+            "courseDates": [{"start": start.strftime("%Y%m%d"), "end": end.strftime("%Y%m%d")}],
+            "applicationDeadline": (start - timedelta(days=60)).strftime("%Y%m%d"),
+            "spots": rng.randint(8, 30),
+            "status": "open",
+        })
+
+    event_weights = [popularity[template_ids.index(e["templateId"])] for e in events]
+    applications = []
+    for m in range(n_applications):
+        choices = rng.choices(events, event_weights, k=rng.randint(1, 5))
+        applications.append({
+            "member": f"member-{m}",
+            "choices": [e["id"] for e in choices],
+            "completed": rng.sample(template_ids, rng.randint(0, 6)),
+            "seats": 2 if rng.random() < 0.1 else 1,
+            "submitted": "20251101",
+        })
+
+    return applications, events
+
+def benchmark(n_applications, seed=1):
+    with open(TEMPLATE_FILE, encoding="utf-8") as f:
+        templates = json.load(f)["templates"]
+
+    applications, events = synthetic_round(n_applications, templates, seed)
+    result = allocate(applications, events, templates, round_date="20251101")
+    stats = result["stats"]
+
+    print(
+        f"[BENCHMARK] {stats['applications']} applications | {len(events)} events | "
+        f"{stats['eligibleChoices']} eligible choices"
+    )
+    print(
+        f"[BENCHMARK] Assigned {stats['assigned']} seats | by rank {stats['byRank']} | "
+        f"unassigned {stats['unassigned']}"
+    )
+    print(
+        f"[BENCHMARK] {stats['conflictRounds']} rounds | {stats['phases']} flow phases | "
+        f"{stats['seconds']}s"
+    )
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocate course seats to a batch of applications")
+    parser.add_argument("--applications", default=APPLICATION_FILE)
+    parser.add_argument("--out", default=OUTPUT_FILE)
+    parser.add_argument("--date", help="round date YYYYMMDD for applications without one (default today)")
+    parser.add_argument("--default-spots", type=int, help="capacity of events without spots (default: skip them)")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="allocate N synthetic applications and exit")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.seed)
+        return
+
+    if args.date:
+        datetime.strptime(args.date, "%Y%m%d")
+
+    with open(TEMPLATE_FILE, encoding="utf-8") as f:
+        templates = json.load(f)["templates"]
+    with open(EVENT_FILE, encoding="utf-8") as f:
+        events = json.load(f)["events"]
+    with open(args.applications, encoding="utf-8") as f:
+        applications = json.load(f)["applications"]
+
+    result = allocate(applications, events, templates, args.date, args.default_spots)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    stats = result["stats"]
+    print(
+        f"[DONE] Assigned {stats['assigned']} seats to {stats['applications'] - stats['unassigned']} "
+        f"of {stats['applications']} applications in {stats['seconds']}s"
+    )
+    if stats["rejectedChoices"]:
+        print(f"[REJECTED] {' | '.join(f'{k}: {v}' for k, v in stats['rejectedChoices'].items())}")
+
+if __name__ == "__main__":
+    main()
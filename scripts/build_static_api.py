@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+TEMPLATE_FILE = "data/hemvarn_course_templates_enriched.json"
+EVENT_FILE = "data/hemvarn_course_events.json"
+API_DIR = "public/api"
+MANIFEST_FILE = "manifest.json"
+
+API_VERSION = 1
+NO_CATEGORY = "okategoriserad"
+NO_MONTH = "nodate"
+
+# ============================================================
+# UTILITIES
+# ============================================================
+
+def slug(s):
+    s = (s or "").lower()
+    for a, b in (("å", "a"), ("ä", "a"), ("ö", "o"), ("é", "e")):
+        s = s.replace(a, b)
+    s = re.sub(r"[^a-z0-9]+", "-", s).strip("-")
+    return s or NO_CATEGORY
+
+def encode(doc):
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def etag(data):
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+def event_category(event, template):
+    # CSV-imported events carry their row's own category, as in the exports
+    return event.get("category") or template.get("category")
+
+def event_month(event):
+    dates = event.get("courseDates") or []
+    if dates and dates[0].get("start"):
+        return dates[0]["start"][:6]
+    return NO_MONTH
+
+# ============================================================
+# DOCUMENTS
+# ============================================================
+
+def template_paths(templates):
+    """
+    Maps every template id to its document path. Ids hold spaces and Swedish
+    letters, so file names are slugged and numbered when two ids slug alike;
+    clients look the path up in the manifest instead of building it.
+    """
+    paths = {}
+    # templates/index.json is the listing
+    taken = {"index"}
+    for template in templates:
+        name = base = slug(template["id"])
+        n = 2
+        while name in taken:
+            name = f"{base}-{n}"
+            n += 1
+        taken.add(name)
+        paths[template["id"]] = f"templates/{name}.json"
+    return paths
+
+def template_summary(template, path):
+    return {
+        "id": template["id"],
+        "name": template["name"],
+        "shortName": template.get("shortName"),
+        "category": template.get("category"),
+        "courseCode": template.get("courseCode"),
+        "href": path,
+    }
+
+def build_documents(templates, events):
+    """
+    Returns (documents, shard_index) where documents maps a path relative to
+    API_DIR to its JSON document and shard_index maps every id to the
+    document(s) it lives in.
+    """
+    docs = {}
+    shard_index = {"templates": {}, "events": {}}
+
+    templates_by_id = {t["id"]: t for t in templates}
+    paths = template_paths(templates)
+
+    for template in templates:
+        path = paths[template["id"]]
+        docs[path] = template
+        shard_index["templates"][template["id"]] = path
+
+    docs["templates/index.json"] = {
+        "templates": [template_summary(t, paths[t["id"]]) for t in templates]
+    }
+
+    by_category = {}
+    by_month = {}
+
+    for event in events:
+        template = templates_by_id.get(event.get("templateId"), {})
+        category = slug(event_category(event, template))
+        month = event_month(event)
+
+        by_category.setdefault(category, []).append(event)
+        by_month.setdefault(month, []).append(event)
+
+        shard_index["events"][event["id"]] = {
+            "category": f"events/by-category/{category}.json",
+            "month": f"events/by-month/{month}.json",
+        }
+
+    for category, shard in sorted(by_category.items()):
+        docs[f"events/by-category/{category}.json"] = {
+            "category": category,
+            "events": shard,
+        }
+
+    for month, shard in sorted(by_month.items()):
+        docs[f"events/by-month/{month}.json"] = {
+            "month": month,
+            "events": shard,
+        }
+
+    docs["events/index.json"] = {
+        "categories": [
+            {"category": c, "count": len(s), "href": f"events/by-category/{c}.json"}
+            for c, s in sorted(by_category.items())
+        ],
+        "months": [
+            {"month": m, "count": len(s), "href": f"events/by-month/{m}.json"}
+            for m, s in sorted(by_month.items())
+        ],
+    }
+
+    return docs, shard_index
+
+# ============================================================
+# WRITE
+# ============================================================
+
+def write_variants(path, data):
+    full_path = os.path.join(API_DIR, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    with open(full_path, "wb") as f:
+        f.write(data)
+
+    # mtime=0 keeps the gzip bytes stable across rebuilds
+    with open(full_path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+
+    if brotli:
+        with open(full_path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+def remove_variants(path):
+    full_path = os.path.join(API_DIR, path)
+    for suffix in ("", ".gz", ".br"):
+        if os.path.exists(full_path + suffix):
+            os.remove(full_path + suffix)
+
+def load_previous_manifest():
+    path = os.path.join(API_DIR, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def build(templates, events):
+    """
+    Writes the static API tree, touching only documents whose content hash
+    changed since the previous build.
+    """
+    previous = load_previous_manifest()
+    previous_files = previous.get("files", {})
+    compression = ["gzip", "br"] if brotli else ["gzip"]
+    # Different compression set means every variant must be regenerated
+    force = previous.get("compression") != compression
+
+    docs, shard_index = build_documents(templates, events)
+
+    files = {}
+    stats = {"written": 0, "unchanged": 0, "removed": 0}
+
+    for path, doc in sorted(docs.items()):
+        data = encode(doc)
+        tag = etag(data)
+        files[path] = {"etag": tag, "size": len(data)}
+
+        if (
+            not force
+            and previous_files.get(path, {}).get("etag") == tag
+            and os.path.exists(os.path.join(API_DIR, path))
+        ):
+            stats["unchanged"] += 1
+            continue
+
+        write_variants(path, data)
+        stats["written"] += 1
+
+    for path in previous_files:
+        if path not in files:
+            remove_variants(path)
+            stats["removed"] += 1
+
+    manifest = {
+        "version": API_VERSION,
+        "compression": compression,
+        "templates": shard_index["templates"],
+        "events": shard_index["events"],
+        "files": files,
+    }
+    manifest_data = encode(manifest)
+    if manifest != previous:
+        write_variants(MANIFEST_FILE, manifest_data)
+
+    return stats
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    with open(TEMPLATE_FILE, encoding="utf-8") as f:
+        templates = json.load(f)["templates"]
+
+    with open(EVENT_FILE, encoding="utf-8") as f:
+        events = json.load(f)["events"]
+
+    stats = build(templates, events)
+
+    print(
+        f"[DONE] API in {API_DIR}: written {stats['written']} | "
+        f"unchanged {stats['unchanged']} | removed {stats['removed']}"
+    )
+    if not brotli:
+        print("[INFO] brotli not installed, only .gz variants written")
+
+if __name__ == "__main__":
+    main()
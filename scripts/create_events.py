@@ -1,12 +1,19 @@
 import os
 import re
 import json
-import time
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from openai import OpenAI
-import pdfplumber
 from tqdm import tqdm
+from extract_text import PDF_DIR, extract_pdf_text
+from file_locks import lock_for
+from import_events_from_tsv import CSV_SOURCE
+from swedish_dates import catalog_year, find_dates, find_course_dates, normalize_date, course_date_errors
+from model_router import Router, RateLimiter
+from json_stream import StopStream
+from structured_output import (
+    FieldError, new_stats, format_stats, strict_schema, response_format, generate_object
+)
 
 # ============================================================
 # CONFIG
@@ -15,16 +22,19 @@ from tqdm import tqdm
 load_dotenv()
 client = OpenAI()
 
-PDF_DIR = "public/kurskataloger"
-TEXT_DIR = "extracted_text"
 TEMPLATE_FILE = "data/hemvarn_course_templates_enriched.json"
 OUTPUT_FILE = "data/hemvarn_course_events.json"
+EVENT_SCHEMA_FILE = "data/course_event_schema.json"
 
 MODEL = "gpt-4.1-mini"
+# Used for long or ambiguous blocks, and when MODEL's answer fails validation
+LARGE_MODEL = "gpt-4.1"
 TEMPERATURE = 0.1
 THROTTLE_SECONDS = 2.0
-
-os.makedirs(TEXT_DIR, exist_ok=True)
+# Candidate blocks are at most six lines; longer ones are usually tables
+LONG_BLOCK_CHARS = 600
+# Set to 0 for models (or local stand-ins) without strict JSON schema output
+STRUCTURED_OUTPUTS = os.getenv("STRUCTURED_OUTPUTS", "1") != "0"
 
 # ============================================================
 # UTILITIES
@@ -62,25 +72,6 @@ def generate_event_id(event, existing_ids):
         suffix = chr(ord(suffix) + 1)
     return f"{base}-{suffix}"
 
-# ============================================================
-# PDF → TEXT
-# ============================================================
-
-def extract_pdf_text(pdf_name):
-    txt_path = os.path.join(TEXT_DIR, pdf_name.replace(".pdf", ".txt"))
-    pdf_path = os.path.join(PDF_DIR, pdf_name)
-
-    if os.path.exists(txt_path):
-        return txt_path
-
-    with pdfplumber.open(pdf_path) as pdf, open(txt_path, "w", encoding="utf-8") as out:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                out.write(text + "\n")
-
-    return txt_path
-
 # ============================================================
 # HIGH-RECALL CANDIDATE EXTRACTION
 # ============================================================
@@ -115,13 +106,50 @@ def extract_candidate_blocks(text):
 # LOAD TEMPLATES
 # ============================================================
 
-with open(TEMPLATE_FILE, encoding="utf-8") as f:
-    templates = json.load(f)["templates"]
+def load_template_hints():
+    """
+    Hints for the catalog templates. Templates the TSV import created for
+    its own rows are left out, so a scan finds the same templates whether it
+    runs before, after or alongside the import.
+    """
+    # The TSV import may be rewriting the template file in another thread
+    with lock_for(TEMPLATE_FILE), open(TEMPLATE_FILE, encoding="utf-8") as f:
+        templates = json.load(f)["templates"]
+
+    return [
+        {"id": t["id"], "name": t["name"], "shortName": t.get("shortName"), "courseCode": t.get("courseCode")}
+        for t in templates
+        if t.get("sourceFiles") != [CSV_SOURCE]
+    ]
+
+def template_matcher(template_hints):
+    """
+    Returns a function giving the ids of the templates a text names by
+    course code, short name or name.
+    """
+    aliases = {}
+    for t in template_hints:
+        for alias in (t.get("courseCode"), t.get("shortName"), t["name"]):
+            if alias and len(alias) >= 3:
+                aliases.setdefault(alias.lower(), set()).add(t["id"])
+
+    # An empty alternation would match "" everywhere
+    if not aliases:
+        return lambda text: set()
+
+    # Longest first, so "Gruppchefskurs 2" wins over "Gruppchefskurs"
+    pattern = re.compile(
+        r"(?<!\w)(" + "|".join(re.escape(a) for a in sorted(aliases, key=len, reverse=True)) + r")(?!\w)",
+        re.IGNORECASE,
+    )
 
-TEMPLATE_HINTS = [
-    {"id": t["id"], "name": t["name"], "shortName": t.get("shortName")}
-    for t in templates
-]
+    def match(text):
+        ids = set()
+        for m in pattern.finditer(text):
+            ids |= aliases[m.group().lower()]
+        return ids
+
+    return match
 
 # ============================================================
 # AI NORMALIZATION
@@ -133,12 +161,14 @@ You extract COURSE EVENTS from Swedish Hemvärnet catalogs.
 Input:
 - Raw text that MAY describe one scheduled course event
 - Known course templates
+- courseDates, when they could be read from the text locally
 
 If the text does NOT describe a concrete event:
-→ return null
+→ return {"isEvent": false} (or null)
 
 If it DOES:
-→ return ONE JSON object with:
+→ return ONE JSON object with these fields, in this order:
+isEvent (true)
 templateId
 courseDates [{start, end}]
 location
@@ -151,78 +181,168 @@ notes
 Rules:
 - Use Swedish
 - Normalize dates to YYYYMMDD
+- If courseDates are given in the input, do not return them
 - Do not invent data
 - Output JSON or null ONLY
 """
 
-def normalize_event(block_text):
-    response = client.responses.create(
-        model=MODEL,
-        temperature=TEMPERATURE,
-        input=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": json.dumps(
-                    {"text": block_text, "knownTemplates": TEMPLATE_HINTS},
-                    ensure_ascii=False,
-                ),
-            },
-        ],
-    )
+with open(EVENT_SCHEMA_FILE, encoding="utf-8") as f:
+    EVENT_SCHEMA = json.load(f)
 
-    raw = response.output_text.strip()
+# Model output: an isEvent verdict first, then the event fields
+VERDICT_FIELD = {"isEvent": {"type": "boolean", "description": "Whether the text describes a concrete course event."}}
+EVENT_FIELDS = [
+    "templateId", "courseDates", "location", "eventResponsible",
+    "applicationDeadline", "spots", "status", "notes"
+]
 
-    if raw.lower() == "null":
-        return None
+OUTPUT_STATS = new_stats()
+ROUTER = Router([("small", MODEL), ("large", LARGE_MODEL)], long_input=LONG_BLOCK_CHARS)
+THROTTLE = RateLimiter(THROTTLE_SECONDS)
+
+def check_event_field(key, value, known_ids, year=None):
+    """
+    Validates one field as soon as the model has produced it. Non-events and
+    unknown templates stop generation; other bad values are repaired locally
+    or asked for again.
+    """
+    if key == "isEvent" and value is not True:
+        raise StopStream("not an event")
+
+    if key == "templateId" and value not in known_ids:
+        raise StopStream(f"unknown templateId {value!r}")
+
+    if key == "courseDates":
+        # Dates the model wrote as "2026-09-01" or "3 mars" are fixed here
+        # rather than asked for again
+        try:
+            value = [
+                {"start": normalize_date(d["start"], year), "end": normalize_date(d["end"], year)}
+                for d in value
+            ]
+        except (KeyError, TypeError, ValueError):
+            pass
+        errors = course_date_errors(value)
+        if errors:
+            raise FieldError(f"must be a list of {{start, end}} in YYYYMMDD: {'; '.join(errors)}")
+        return value
+
+    if key == "spots" and value is not None and not isinstance(value, int):
+        if isinstance(value, str) and value.strip().isdigit():
+            return int(value)
+        raise FieldError(f"must be an integer or null, got {value!r}")
+
+    return value
+
+def normalize_event(block_text, template_hints, year=None, course_dates=None, model=MODEL):
+    """
+    course_dates, when already resolved locally, are not asked for.
+    """
+    known_ids = {t["id"] for t in template_hints}
+    payload = {"text": block_text, "knownTemplates": template_hints}
+    fields = EVENT_FIELDS
+    if course_dates:
+        payload["courseDates"] = course_dates
+        fields = [f for f in EVENT_FIELDS if f != "courseDates"]
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": json.dumps(payload, ensure_ascii=False),
+        },
+    ]
+
+    def start_stream(fields, followup):
+        options = {}
+        if STRUCTURED_OUTPUTS:
+            verdict = VERDICT_FIELD if "isEvent" in fields else None
+            schema = strict_schema(EVENT_SCHEMA, [f for f in fields if f != "isEvent"], verdict)
+            options["text"] = response_format("course_event", schema)
+
+        followups = [{"role": "user", "content": followup}] if followup else []
+        return client.responses.create(
+            model=model,
+            temperature=TEMPERATURE,
+            stream=True,
+            input=messages + followups,
+            **options,
+        )
 
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
+    event = generate_object(
+        start_stream,
+        ["isEvent"] + fields,
+        lambda key, value: check_event_field(key, value, known_ids, year),
+        OUTPUT_STATS,
+    )
+    if event is None:
         return None
 
+    if course_dates:
+        event["courseDates"] = course_dates
+    return {f: event[f] for f in EVENT_FIELDS}
+
 # ============================================================
-# MAIN
+# SCAN
 # ============================================================
 
-events = []
-existing_ids = set()
-fingerprints = {}
-
-stats = {"candidates": 0, "accepted": 0}
-
-for pdf in tqdm(os.listdir(PDF_DIR), desc="Scanning PDFs"):
-    if not pdf.lower().endswith(".pdf"):
-        continue
+def event_fingerprint(event):
+    return (
+        event["templateId"],
+        json.dumps(event.get("courseDates"), sort_keys=True),
+        event.get("location"),
+        event.get("eventResponsible"),
+    )
 
-    txt_path = extract_pdf_text(pdf)
+def scan_pdf(pdf, template_hints, events, existing_ids, fingerprints, stats, force_extract=False):
+    txt_path = extract_pdf_text(pdf, force=force_extract)
     with open(txt_path, encoding="utf-8") as f:
         text = f.read()
 
     candidates = extract_candidate_blocks(text)
     stats["candidates"] += len(candidates)
+    year = catalog_year(pdf)
+    match_templates = template_matcher(template_hints)
 
     for block in candidates:
-        event = normalize_event(block)
+        # Only the line that made this a candidate; later lines are notes
+        # such as "även del 2 v517"
+        first_line = block.splitlines()[0]
+        course_dates = find_course_dates(first_line, year)
+        if course_dates:
+            stats["localDates"] += 1
+
+        # A lone date is usually a page header or a decision date; an event
+        # row has a range, or a start date and a deadline
+        matched = match_templates(block)
+        tier = ROUTER.route(
+            matched=bool(matched),
+            dated=bool(course_dates) or len(find_dates(first_line, year)) >= 2,
+            length=len(block),
+            source=pdf,
+            ambiguous=len(matched) > 1,
+        )
+
+        event, model = ROUTER.run(
+            tier,
+            lambda m: normalize_event(block, template_hints, year, course_dates, model=m),
+            source=pdf,
+        )
 
         if not event or not event.get("templateId"):
             continue
 
         stats["accepted"] += 1
 
-        event["lastModifiedBy"] = MODEL
+        event["lastModifiedBy"] = model
         event["lastModified"] = now_utc()
         event["sourceFiles"] = [pdf]
 
-        fp = (
-            event["templateId"],
-            json.dumps(event.get("courseDates"), sort_keys=True),
-            event.get("location"),
-            event.get("eventResponsible"),
-        )
+        fp = event_fingerprint(event)
 
         if fp in fingerprints:
-            fingerprints[fp]["sourceFiles"].append(pdf)
+            if pdf not in fingerprints[fp]["sourceFiles"]:
+                fingerprints[fp]["sourceFiles"].append(pdf)
             continue
 
         event["id"] = generate_event_id(event, existing_ids)
@@ -231,17 +351,119 @@ for pdf in tqdm(os.listdir(PDF_DIR), desc="Scanning PDFs"):
         fingerprints[fp] = event
         events.append(event)
 
-        time.sleep(THROTTLE_SECONDS)
+        THROTTLE.wait()
 
 # ============================================================
 # OUTPUT
 # ============================================================
 
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump({"events": events}, f, ensure_ascii=False, indent=2)
+def load_events():
+    if not os.path.exists(OUTPUT_FILE):
+        return []
+    with open(OUTPUT_FILE, encoding="utf-8") as f:
+        return json.load(f)["events"]
+
+def write_events(events):
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump({"events": events}, f, ensure_ascii=False, indent=2)
+
+def merge_scanned(pdfs, scanned):
+    """
+    Replaces the events of the given catalogs in OUTPUT_FILE with scanned,
+    leaving events from every other source (other catalogs, the TSV import)
+    untouched. An event that several catalogs list keeps its other sources.
+
+    Scanned events are only merged with other catalog events, never with
+    TSV rows: the import owns its events and may run in parallel, and the
+    result must not depend on which of the two wrote first.
+    """
+    with lock_for(OUTPUT_FILE):
+        events = []
+        for event in load_events():
+            sources = event.get("sourceFiles", [])
+            if any(pdf in sources for pdf in pdfs):
+                event["sourceFiles"] = [s for s in sources if s not in pdfs]
+                if not event["sourceFiles"]:
+                    continue
+            events.append(event)
+
+        existing_ids = {e["id"] for e in events}
+        fingerprints = {
+            event_fingerprint(e): e
+            for e in events
+            if e.get("templateId") and CSV_SOURCE not in e.get("sourceFiles", [])
+        }
+
+        for event in scanned:
+            fp = event_fingerprint(event)
+            if fp in fingerprints:
+                for pdf in event["sourceFiles"]:
+                    if pdf not in fingerprints[fp]["sourceFiles"]:
+                        fingerprints[fp]["sourceFiles"].append(pdf)
+                continue
+
+            event["id"] = generate_event_id(event, existing_ids)
+            existing_ids.add(event["id"])
+            fingerprints[fp] = event
+            events.append(event)
+
+        write_events(events)
+        return events
+
+def rescan_pdf(pdf, force_extract=True):
+    """
+    Re-scans a single catalog and merges its events into OUTPUT_FILE,
+    leaving events from every other source untouched. The slow model calls
+    happen before the event file is locked, so several catalogs (or the
+    TSV import) can be processed in parallel.
+
+    Returns the catalog's counts plus the output and router summaries,
+    which cover every catalog scanned by this process so far.
+    """
+    stats = {"candidates": 0, "accepted": 0, "localDates": 0}
+    scanned = []
+
+    if os.path.exists(os.path.join(PDF_DIR, pdf)):
+        scan_pdf(pdf, load_template_hints(), scanned, set(), {}, stats, force_extract=force_extract)
+
+    merge_scanned([pdf], scanned)
+
+    stats["output"] = format_stats(OUTPUT_STATS)
+    stats["router"] = ROUTER.summary()
+    return stats
 
-print(
-    f"[DONE] Candidates: {stats['candidates']} | "
-    f"Accepted events: {stats['accepted']} | "
-    f"Unique events: {len(events)}"
-)
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    template_hints = load_template_hints()
+    events = []
+    existing_ids = set()
+    fingerprints = {}
+
+    stats = {"candidates": 0, "accepted": 0, "localDates": 0}
+    pdfs = [pdf for pdf in os.listdir(PDF_DIR) if pdf.lower().endswith(".pdf")]
+
+    for pdf in tqdm(pdfs, desc="Scanning PDFs"):
+        scan_pdf(pdf, template_hints, events, existing_ids, fingerprints, stats)
+
+    # Catalogs no longer in PDF_DIR are dropped too; TSV events are kept
+    previous_pdfs = {
+        s for e in load_events() for s in e.get("sourceFiles", [])
+        if s.lower().endswith(".pdf")
+    }
+    merged = merge_scanned(previous_pdfs | set(pdfs), events)
+
+    print(
+        f"[DONE] Candidates: {stats['candidates']} | "
+        f"Accepted events: {stats['accepted']} | "
+        f"Dates read locally: {stats['localDates']} | "
+        f"Unique events: {len(events)} | "
+        f"Total with other sources: {len(merged)}"
+    )
+    print(f"[OUTPUT] {format_stats(OUTPUT_STATS)}")
+    print(f"[ROUTER] {ROUTER.summary()}")
+
+if __name__ == "__main__":
+    main()
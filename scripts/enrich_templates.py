@@ -5,10 +5,15 @@ import time
 import random
 from dotenv import load_dotenv
 from tqdm import tqdm
-import pdfplumber
-from jsonschema import validate
+from jsonschema import validate, ValidationError
 from openai import OpenAI, RateLimitError
 from datetime import datetime, timezone
+from section_dedup import index_for, collapse_editions
+from extract_text import extract_pdf_text
+from model_router import Router
+from structured_output import (
+    FieldError, new_stats, format_stats, strict_schema, response_format, generate_object
+)
 
 # =========================
 # CONFIG
@@ -19,20 +24,25 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY missing")
 
-PDF_DIR = "public/kurskataloger"
-TEXT_DIR = "extracted_text"
 TEMPLATE_FILE = "data/hemvarn_course_templates_all.json"
 SCHEMA_FILE = "data/course_template_schema.json"
 OUTPUT_FILE = "data/hemvarn_course_templates_enriched.json"
 
 MODEL = os.getenv("ENRICH_MODEL", "gpt-4.1-mini")
+# Used for long source texts, and when MODEL's answer fails validation
+LARGE_MODEL = os.getenv("ENRICH_LARGE_MODEL", "gpt-4.1")
 TEMPERATURE = 0.2
 THROTTLE_SECONDS = 0.5
-
-os.makedirs(TEXT_DIR, exist_ok=True)
+# One catalog is about 240k characters; more means several series to reconcile
+LONG_SOURCE_CHARS = 250000
+# Set to 0 for models (or local stand-ins) without strict JSON schema output
+STRUCTURED_OUTPUTS = os.getenv("STRUCTURED_OUTPUTS", "1") != "0"
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+OUTPUT_STATS = new_stats()
+ROUTER = Router([("small", MODEL), ("large", LARGE_MODEL)], long_input=LONG_SOURCE_CHARS)
+
 # =========================
 # Date helpers
 # =========================
@@ -40,23 +50,6 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 def now_utc_timestamp():
     return datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
 
-# =========================
-# PDF → TEXT
-# =========================
-
-def extract_pdf_to_text(pdf_name):
-    txt_path = os.path.join(TEXT_DIR, pdf_name.replace(".pdf", ".txt"))
-    pdf_path = os.path.join(PDF_DIR, pdf_name)
-
-    if os.path.exists(txt_path):
-        return
-
-    with pdfplumber.open(pdf_path) as pdf, open(txt_path, "w", encoding="utf-8") as out:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            if text:
-                out.write(f"\n=== PAGE {i+1} ===\n{text}\n")
-
 # =========================
 # ALIASES
 # =========================
@@ -77,24 +70,33 @@ def build_course_aliases(template):
 # =========================
 
 def load_source_text(template):
+    """
+    Returns (source_text, changed). Catalogs that are editions of the same
+    series are collapsed so near-identical course sections are only sent
+    once; changed tells whether the course's own section differs between
+    editions.
+    """
     aliases = build_course_aliases(template)
-    collected = []
+    indexes = {}
 
     for pdf in template["sourceFiles"]:
-        extract_pdf_to_text(pdf)
-        txt_path = os.path.join(TEXT_DIR, pdf.replace(".pdf", ".txt"))
+        txt_path = extract_pdf_text(pdf)
         if not os.path.exists(txt_path):
             continue
 
-        with open(txt_path, encoding="utf-8") as f:
-            content = f.read().lower()
+        index = index_for(txt_path)
+        content = "\n".join(index.sections)
 
         for alias in aliases:
             if alias in content:
-                collected.append(content)
+                indexes[pdf] = index
                 break
 
-    return "\n".join(collected)
+    course_keys = sorted(aliases, key=len, reverse=True)
+    if template.get("courseCode"):
+        course_keys.insert(0, template["courseCode"].lower())
+
+    return collapse_editions(indexes, course_keys)
 
 # =========================
 # MERGE
@@ -118,13 +120,16 @@ def merge_templates(original, enriched):
 # OPENAI CALL
 # =========================
 
-def call_with_retry(messages, retries=6):
+def call_with_retry(messages, retries=6, stream=False, text_format=None, model=MODEL):
+    options = {"text": text_format} if text_format else {}
     for attempt in range(retries):
         try:
             return client.responses.create(
-                model=MODEL,
+                model=model,
                 temperature=TEMPERATURE,
-                input=messages
+                input=messages,
+                stream=stream,
+                **options
             )
         except RateLimitError as e:
             wait = 10 + attempt * 5
@@ -156,8 +161,8 @@ Rules:
 - If source text is missing, you MAY synthesize high-level, well-established knowledge.
 - If a course code (courseCode) is provided, preserve its exact lower or upper case format as in official catalogs.
 - Do NOT invent exact hours, regulations, or examination rules unless obvious.
-- Do NOT modify id, name, shortName, category, courseResponsible, baseTemplateIds, or sourceFiles.
-- Output ONLY a valid CourseTemplate JSON object.
+- Do NOT output id, name, shortName, category, courseResponsible, baseTemplateIds, or sourceFiles; they are fixed.
+- Output ONLY a JSON object with the remaining CourseTemplate fields.
 """
 
 
@@ -242,7 +247,40 @@ CONTRAST_EXAMPLE = {
 # ENRICH
 # =========================
 
-def enrich_template(template, source_text, schema):
+def normalize_field(key, value, schema):
+    if key == "courseCode" and value:
+        return value.upper()
+
+    # Handle None values - convert to appropriate defaults based on schema
+    if value is None:
+        prop_type = schema["properties"][key].get("type")
+        # If type allows null, keep None
+        if isinstance(prop_type, list) and "null" in prop_type:
+            return value
+        # Otherwise convert to appropriate default
+        if prop_type == "array" or (isinstance(prop_type, list) and "array" in prop_type):
+            return []
+        elif prop_type == "string" or (isinstance(prop_type, list) and "string" in prop_type):
+            return ""
+
+    return value
+
+def enrichable_fields(schema):
+    return [k for k in schema["required"] if k not in IMMUTABLE_FIELDS]
+
+def check_field(key, value, schema):
+    value = normalize_field(key, value, schema)
+    try:
+        validate(instance=value, schema=schema["properties"][key])
+    except ValidationError as e:
+        raise FieldError(e.message)
+    return value
+
+def enrich_template(template, source_text, schema, model=MODEL):
+    """
+    Returns the enriched fields. Raises GenerationFailed when the model
+    could not produce a valid answer even after local repair and re-asks.
+    """
     payload = {
         "primaryExample": PRIMARY_EXAMPLE,      # full GC1 JSON
         "contrastExample": CONTRAST_EXAMPLE,    # reduced KombU
@@ -250,36 +288,24 @@ def enrich_template(template, source_text, schema):
         "sourceText": source_text
     }
 
-    response = call_with_retry([
+    messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
-    ])
-
-    enriched = json.loads(response.output_text.strip())
-
-    # Strip extras
-    enriched = {k: v for k, v in enriched.items() if k in schema["properties"]}
-
-    if enriched.get("courseCode"):
-      enriched["courseCode"] = enriched["courseCode"].upper()
-
-    # Handle None values - convert to appropriate defaults based on schema
-    for key, prop in schema["properties"].items():
-        if key in enriched and enriched[key] is None:
-            prop_type = prop.get("type")
-            # If type allows null, keep None
-            if isinstance(prop_type, list) and "null" in prop_type:
-                continue
-            # Otherwise convert to appropriate default
-            if prop_type == "array" or (isinstance(prop_type, list) and "array" in prop_type):
-                enriched[key] = []
-            elif prop_type == "string" or (isinstance(prop_type, list) and "string" in prop_type):
-                enriched[key] = ""
-
-    # Validate
-    validate(instance=enriched, schema=schema)
-
-    return enriched
+    ]
+
+    def start_stream(fields, followup):
+        followups = [{"role": "user", "content": followup}] if followup else []
+        text_format = None
+        if STRUCTURED_OUTPUTS:
+            text_format = response_format("course_template", strict_schema(schema, fields))
+        return call_with_retry(messages + followups, stream=True, text_format=text_format, model=model)
+
+    return generate_object(
+        start_stream,
+        enrichable_fields(schema),
+        lambda key, value: check_field(key, value, schema),
+        OUTPUT_STATS,
+    )
 
 # =========================
 # MAIN
@@ -292,23 +318,46 @@ def main():
     with open(SCHEMA_FILE, encoding="utf-8") as f:
         schema = json.load(f)
 
+    changed_templates = []
+
     for i, template in enumerate(tqdm(catalog["templates"], desc="Enriching")):
 
         # Skip merged templates
         if template.get("baseTemplateIds"):
             continue
 
+        source_text, changed = load_source_text(template)
+        if changed:
+            changed_templates.append(template["id"])
+
         if template.get("description"):
             continue
 
-        source_text = load_source_text(template)
-        enriched = enrich_template(template, source_text, schema)
+        # Every template gets a description, so nothing is routed to "none";
+        # without catalog text the model only summarizes general knowledge,
+        # which the small model handles
+        source = (template.get("sourceFiles") or [None])[0]
+        tier = ROUTER.route(
+            matched=True,
+            dated=False,
+            length=len(source_text),
+            source=source,
+            allow_none=False,
+        )
+        enriched, model = ROUTER.run(
+            tier,
+            lambda m: enrich_template(template, source_text, schema, model=m),
+            source=source,
+        )
+        if enriched is None:
+            print(f"[DROPPED] {template['id']}: no valid answer from any model")
+            continue
 
         merged = merge_templates(template, enriched)
 
         # Only update metadata if something actually changed
         if merged != template:
-            merged["lastModifiedBy"] = MODEL
+            merged["lastModifiedBy"] = model
             merged["lastModified"] = now_utc_timestamp()
 
         catalog["templates"][i] = merged
@@ -320,6 +369,13 @@ def main():
         time.sleep(THROTTLE_SECONDS)
 
     print("[DONE] Enrichment complete")
+    print(f"[OUTPUT] {format_stats(OUTPUT_STATS)}")
+    print(f"[ROUTER] {ROUTER.summary()}")
+
+    if changed_templates:
+        print(f"[CHANGED] Course text differs between catalog editions for {len(changed_templates)} templates:")
+        for template_id in changed_templates:
+            print(f"  - {template_id}")
 
 if __name__ == "__main__":
     main()
@@ -24,7 +24,9 @@ const exportCourseEvents = async () => {
             notes: row.notes,
             lastModifiedBy: row.last_modified_by,
             lastModified: row.last_modified,
-            sourceFiles: row.source_files
+            sourceFiles: row.source_files,
+            courseName: row.course_name ?? undefined,
+            category: row.category ?? undefined
         }));
 
         const exportObj = {
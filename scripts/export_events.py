@@ -0,0 +1,351 @@
+import os
+import re
+import csv
+import json
+import argparse
+from datetime import datetime, timedelta, timezone
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Only needed for --source db
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+TEMPLATE_FILE = "data/hemvarn_course_templates_enriched.json"
+EVENT_FILE = "data/hemvarn_course_events.json"
+EXPORT_DIR = "public/export"
+
+DELIMITER = "\t"
+DATE_SEPARATOR = ", "
+
+# Same column layout as public/events.csv, which import_events_from_tsv reads
+CSV_HEADERS = [
+    "KURSKOD", "KURSBENÄMNING", "START", "SLUT", "SISTA ANSÖKNINGSDAG",
+    "ANSVARIG", "ORT", "Kategori", "Platser", "Övrigt"
+]
+
+DB_FETCH_SIZE = 500
+
+EVENT_QUERY = """
+    SELECT e.id, e.template_id, e.course_dates, e.location, e.event_responsible,
+           e.application_deadline, e.spots, e.status, e.notes,
+           e.last_modified_by, e.last_modified, e.source_files,
+           e.course_name, e.category,
+           t.name, t.course_code, t.category
+    FROM course_events e
+    LEFT JOIN course_templates t ON t.id = e.template_id
+    ORDER BY e.id ASC
+"""
+
+ICS_PRODID = "-//hvkurskatalog//events//SV"
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def slug(s):
+    s = (s or "").lower()
+    for a, b in (("å", "a"), ("ä", "a"), ("ö", "o")):
+        s = s.replace(a, b)
+    return re.sub(r"[^a-z0-9]+", "-", s).strip("-") or "okand"
+
+def iso_date(yyyymmdd):
+    if not yyyymmdd or len(yyyymmdd) != 8:
+        return yyyymmdd or ""
+    return f"{yyyymmdd[:4]}-{yyyymmdd[4:6]}-{yyyymmdd[6:]}"
+
+# ============================================================
+# SOURCES
+# ============================================================
+
+def iter_json_events(event_file=EVENT_FILE, template_file=TEMPLATE_FILE):
+    """
+    Yields (event, template) pairs. Templates are a small lookup table and
+    are loaded whole; events are streamed with ijson when it is installed.
+    """
+    with open(template_file, encoding="utf-8") as f:
+        templates = {t["id"]: t for t in json.load(f)["templates"]}
+
+    with open(event_file, "rb") as f:
+        if ijson:
+            events = ijson.items(f, "events.item", use_float=True)
+        else:
+            events = json.load(f)["events"]
+
+        for event in events:
+            yield event, templates.get(event.get("templateId"), {})
+
+def iter_db_events():
+    """
+    Yields (event, template) pairs from Postgres through a server-side
+    cursor, so only DB_FETCH_SIZE rows are held at a time.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = psycopg2.connect(
+        host=os.getenv("DB_HOST", "192.168.50.47"),
+        port=os.getenv("DB_PORT", 5432),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        dbname=os.getenv("DB_NAME"),
+    )
+
+    try:
+        with conn.cursor(name="export_events") as cur:
+            cur.itersize = DB_FETCH_SIZE
+            cur.execute(EVENT_QUERY)
+            for row in cur:
+                (id, template_id, course_dates, location, event_responsible,
+                 application_deadline, spots, status, notes,
+                 last_modified_by, last_modified, source_files,
+                 event_course_name, event_category,
+                 name, course_code, category) = row
+
+                event = {
+                    "id": id,
+                    "templateId": template_id,
+                    "courseDates": course_dates or [],
+                    "location": location,
+                    "eventResponsible": event_responsible,
+                    "applicationDeadline": application_deadline,
+                    "spots": spots,
+                    "status": status,
+                    "notes": notes,
+                    "lastModifiedBy": last_modified_by,
+                    "lastModified": last_modified,
+                    "sourceFiles": source_files or [],
+                    "courseName": event_course_name,
+                    "category": event_category,
+                }
+                template = {"name": name, "courseCode": course_code, "category": category}
+                yield event, template
+    finally:
+        conn.close()
+
+# ============================================================
+# CSV
+# ============================================================
+
+def course_name(event, template):
+    # CSV-imported events carry the row's own name and category
+    return event.get("courseName") or template.get("name") or ""
+
+def course_category(event, template):
+    return event.get("category") or template.get("category") or ""
+
+def csv_row(event, template):
+    dates = event.get("courseDates") or []
+    return [
+        template.get("courseCode") or "",
+        course_name(event, template),
+        DATE_SEPARATOR.join(iso_date(d.get("start")) for d in dates),
+        DATE_SEPARATOR.join(iso_date(d.get("end")) for d in dates),
+        iso_date(event.get("applicationDeadline")),
+        event.get("eventResponsible") or "",
+        event.get("location") or "",
+        course_category(event, template),
+        "" if event.get("spots") is None else str(event["spots"]),
+        event.get("notes") or "",
+    ]
+
+class CsvWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.f, delimiter=DELIMITER)
+        self.writer.writerow(CSV_HEADERS)
+
+    def write(self, event, template):
+        self.writer.writerow(csv_row(event, template))
+
+    def close(self):
+        self.f.close()
+
+# ============================================================
+# XLSX
+# ============================================================
+
+class XlsxWriter:
+    """
+    openpyxl write-only workbook: rows are flushed to a temp file as they are
+    appended instead of being kept in memory.
+    """
+
+    def __init__(self, path):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Kurstillfällen")
+        self.ws.append(CSV_HEADERS)
+
+    def write(self, event, template):
+        row = csv_row(event, template)
+        if event.get("spots") is not None:
+            row[8] = event["spots"]
+        self.ws.append(row)
+
+    def close(self):
+        self.wb.save(self.path)
+
+# ============================================================
+# ICS
+# ============================================================
+
+def ics_escape(s):
+    return (
+        (s or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+def ics_fold(line):
+    # RFC 5545: lines longer than 75 octets continue with a leading space
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        # Do not split inside a multi-byte UTF-8 sequence
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+def ics_stamp(last_modified):
+    try:
+        return datetime.strptime(last_modified, "%Y%m%d-%H%M%S").strftime("%Y%m%dT%H%M%SZ")
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def ics_events(event, template):
+    summary = course_name(event, template) or event.get("templateId") or ""
+    details = [
+        f"Kurskod: {template['courseCode']}" if template.get("courseCode") else "",
+        f"Ansvarig: {event['eventResponsible']}" if event.get("eventResponsible") else "",
+        f"Sista ansökningsdag: {iso_date(event['applicationDeadline'])}" if event.get("applicationDeadline") else "",
+        f"Platser: {event['spots']}" if event.get("spots") is not None else "",
+        event.get("notes") or "",
+    ]
+    description = "\n".join(d for d in details if d)
+
+    lines = []
+    for n, dates in enumerate(event.get("courseDates") or []):
+        try:
+            start = datetime.strptime(dates["start"], "%Y%m%d")
+            end = datetime.strptime(dates["end"], "%Y%m%d")
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{event['id']}-{n}@hvkurskatalog",
+            f"DTSTAMP:{ics_stamp(event.get('lastModified'))}",
+            f"DTSTART;VALUE=DATE:{start:%Y%m%d}",
+            # DTEND is exclusive for all-day events
+            f"DTEND;VALUE=DATE:{end + timedelta(days=1):%Y%m%d}",
+            f"SUMMARY:{ics_escape(summary)}",
+            f"LOCATION:{ics_escape(event.get('location'))}",
+            f"DESCRIPTION:{ics_escape(description)}",
+            "END:VEVENT",
+        ]
+    return "".join(ics_fold(l) for l in lines)
+
+class IcsWriter:
+    """
+    One calendar per location and one per category. Events are appended to
+    the open calendar files as they stream past, so memory only grows with
+    the number of calendars, not the number of events.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+
+    def calendar(self, kind, name):
+        key = f"{kind}-{slug(name)}"
+        if key not in self.files:
+            f = open(os.path.join(self.directory, f"{key}.ics"), "w", encoding="utf-8", newline="")
+            f.write(ics_fold("BEGIN:VCALENDAR"))
+            f.write(ics_fold("VERSION:2.0"))
+            f.write(ics_fold(f"PRODID:{ICS_PRODID}"))
+            f.write(ics_fold(f"X-WR-CALNAME:{ics_escape(name)}"))
+            self.files[key] = f
+        return self.files[key]
+
+    def write(self, event, template):
+        body = ics_events(event, template)
+        if not body:
+            return
+        self.calendar("ort", event.get("location") or "Okänd ort").write(body)
+        self.calendar("kategori", course_category(event, template) or "Okategoriserad").write(body)
+
+    def close(self):
+        for f in self.files.values():
+            f.write(ics_fold("END:VCALENDAR"))
+            f.close()
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def export(rows, out_dir=EXPORT_DIR, formats=("csv", "xlsx", "ics")):
+    os.makedirs(out_dir, exist_ok=True)
+
+    writers = []
+    if "csv" in formats:
+        writers.append(CsvWriter(os.path.join(out_dir, "events.csv")))
+    if "xlsx" in formats:
+        writers.append(XlsxWriter(os.path.join(out_dir, "events.xlsx")))
+    if "ics" in formats:
+        writers.append(IcsWriter(os.path.join(out_dir, "calendars")))
+
+    count = 0
+    try:
+        for event, template in rows:
+            for writer in writers:
+                writer.write(event, template)
+            count += 1
+    finally:
+        for writer in writers:
+            writer.close()
+
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Export course events as CSV, XLSX and iCalendar")
+    parser.add_argument("--source", choices=["json", "db"], default="json")
+    parser.add_argument("--out", default=EXPORT_DIR)
+    parser.add_argument("--formats", default="csv,xlsx,ics", help="comma-separated subset of csv,xlsx,ics")
+    args = parser.parse_args()
+
+    if args.source == "db" and not psycopg2:
+        parser.error("--source db needs psycopg2 (pip install psycopg2-binary)")
+
+    rows = iter_db_events() if args.source == "db" else iter_json_events()
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+
+    count = export(rows, args.out, formats)
+
+    print(f"[DONE] Exported {count} events ({', '.join(formats)}) to {args.out}")
+    if args.source == "json" and not ijson:
+        print("[INFO] ijson not installed, the event file was loaded whole")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import pdfplumber
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+PDF_DIR = "public/kurskataloger"
+TEXT_DIR = "extracted_text"
+
+# ============================================================
+# PDF → TEXT
+# ============================================================
+
+def text_path(pdf_name):
+    return os.path.join(TEXT_DIR, pdf_name.replace(".pdf", ".txt"))
+
+def extract_pdf_text(pdf_name, force=False):
+    """
+    Extracts a catalog to TEXT_DIR with "=== PAGE n ===" markers and returns
+    the text path. Existing text is reused unless force is set.
+    """
+    txt_path = text_path(pdf_name)
+    pdf_path = os.path.join(PDF_DIR, pdf_name)
+
+    if os.path.exists(txt_path) and not force:
+        return txt_path
+
+    os.makedirs(TEXT_DIR, exist_ok=True)
+
+    with pdfplumber.open(pdf_path) as pdf, open(txt_path, "w", encoding="utf-8") as out:
+        for i, page in enumerate(pdf.pages):
+            text = page.extract_text()
+            if text:
+                out.write(f"\n=== PAGE {i+1} ===\n{text}\n")
+
+    return txt_path
+
+# ============================================================
+# MAIN
+# ============================================================
+
+if __name__ == "__main__":
+    for pdf_name in sys.argv[1:]:
+        print(f"[DONE] {extract_pdf_text(pdf_name, force=True)}")
@@ -0,0 +1,13 @@
+import os
+import threading
+
+# In-process locks for data files that several pipeline stages or watch
+# handlers read, modify and write back.
+
+_locks = {}
+_guard = threading.Lock()
+
+def lock_for(path):
+    key = os.path.abspath(path)
+    with _guard:
+        return _locks.setdefault(key, threading.Lock())
@@ -18,11 +18,19 @@ const importCourseEvents = async () => {
         const templateResult = await pool.query('SELECT id FROM course_templates');
         const validTemplateIds = new Set(templateResult.rows.map(row => row.id));
 
+        // CSV-imported events carry their row's own name and category
+        await pool.query(`
+            ALTER TABLE course_events
+                ADD COLUMN IF NOT EXISTS course_name TEXT,
+                ADD COLUMN IF NOT EXISTS category TEXT
+        `);
+
         for (const event of events) {
             const {
                 id, templateId, courseDates, location, eventResponsible,
                 applicationDeadline, spots, status, notes,
-                lastModifiedBy, lastModified, sourceFiles
+                lastModifiedBy, lastModified, sourceFiles,
+                courseName, category
             } = event;
 
             if (!validTemplateIds.has(templateId)) {
@@ -36,9 +44,10 @@ const importCourseEvents = async () => {
                 INSERT INTO course_events (
                     id, template_id, course_dates, location, event_responsible,
                     application_deadline, spots, status, notes,
-                    last_modified_by, last_modified, source_files
+                    last_modified_by, last_modified, source_files,
+                    course_name, category
                 )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
                 ON CONFLICT (id) DO UPDATE SET
                     template_id = EXCLUDED.template_id,
                     course_dates = EXCLUDED.course_dates,
@@ -50,7 +59,9 @@ const importCourseEvents = async () => {
                     notes = EXCLUDED.notes,
                     last_modified_by = EXCLUDED.last_modified_by,
                     last_modified = EXCLUDED.last_modified,
-                    source_files = EXCLUDED.source_files;
+                    source_files = EXCLUDED.source_files,
+                    course_name = EXCLUDED.course_name,
+                    category = EXCLUDED.category;
             `;
 
             const values = [
@@ -60,7 +71,8 @@ const importCourseEvents = async () => {
                 applicationDeadline,
                 spots, status, notes,
                 lastModifiedBy, lastModified,
-                JSON.stringify(sourceFiles || [])
+                JSON.stringify(sourceFiles || []),
+                courseName ?? null, category ?? null
             ];
 
             await pool.query(queryText, values);
@@ -2,6 +2,8 @@ import csv
 import json
 import os
 from datetime import datetime, timezone
+from file_locks import lock_for
+from swedish_dates import normalize_date, course_date_errors
 
 # ============================================================
 # CONFIG
@@ -13,6 +15,7 @@ EVENT_OUTPUT = "data/hemvarn_course_events.json"
 TEMPLATE_OUTPUT = "data/hemvarn_course_templates_enriched.json"
 
 DELIMITER = "\t"
+CSV_SOURCE = "events.csv"
 
 HEADER_MAP = {
     "kurskod": "courseCode",
@@ -43,9 +46,6 @@ def norm_code(code):
 def template_id_from_code(code):
     return f"auto-{code.lower()}"
 
-def normalize_date(s):
-    return s.replace("-", "").replace(".", "")
-
 def parse_course_dates(start_raw, end_raw):
     """
     Parses comma-separated start/end dates into a list of {start, end}.
@@ -61,7 +61,7 @@ def parse_course_dates(start_raw, end_raw):
             f"Mismatched start/end dates: {start_raw} / {end_raw}"
         )
 
-    return [
+    course_dates = [
         {
             "start": normalize_date(s),
             "end": normalize_date(e),
@@ -69,112 +69,235 @@ def parse_course_dates(start_raw, end_raw):
         for s, e in zip(starts, ends)
     ]
 
+    errors = course_date_errors(course_dates)
+    if errors:
+        raise ValueError(f"Invalid course dates {start_raw} / {end_raw}: {'; '.join(errors)}")
+
+    return course_dates
+
 
 
 # ============================================================
 # LOAD EXISTING TEMPLATES
 # ============================================================
 
-with open(TEMPLATE_FILE, encoding="utf-8") as f:
-    template_catalog = json.load(f)
-
-templates = template_catalog["templates"]
-
-templates_by_code = {
-    t["courseCode"].upper(): t
-    for t in templates
-    if t.get("courseCode")
-}
+def load_template_catalog():
+    with open(TEMPLATE_FILE, encoding="utf-8") as f:
+        return json.load(f)
 
 # ============================================================
 # LOAD TSV
 # ============================================================
 
-events = []
-
-with open(TSV_FILE, encoding="utf-8") as f:
-    reader = csv.reader(f, delimiter=DELIMITER)
-    raw_headers = next(reader)
-
-    headers = []
-    for h in raw_headers:
-        key = h.strip().lower()
-        if key not in HEADER_MAP:
-            raise ValueError(f"Unknown header column: {h}")
-        headers.append(HEADER_MAP[key])
-
-    for row_values in reader:
-        row = dict(zip(headers, row_values))
-
-        course_code = norm_code(row["courseCode"])
-
-        # --------------------------------------------
-        # TEMPLATE RESOLUTION
-        # --------------------------------------------
-        if course_code not in templates_by_code:
-            template = {
-                "id": template_id_from_code(course_code),
-                "courseCode": course_code,
-                "name": row["name"].strip(),
-                "shortName": course_code,
+def read_tsv_events(template_catalog, tsv_file=TSV_FILE):
+    """
+    Reads the TSV into events. Unknown course codes get an auto-created
+    template appended to template_catalog.
+
+    Returns (events, errors). A row with missing columns or unreadable
+    dates or spots is left out and reported in errors as "line N: problem",
+    so one bad cell does not stop the rest of the file from being imported.
+    """
+    templates = template_catalog["templates"]
+
+    templates_by_code = {
+        t["courseCode"].upper(): t
+        for t in templates
+        if t.get("courseCode")
+    }
+
+    events = []
+    errors = []
+
+    with open(tsv_file, encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter=DELIMITER)
+        raw_headers = next(reader)
+
+        headers = []
+        for h in raw_headers:
+            key = h.strip().lower()
+            if key not in HEADER_MAP:
+                raise ValueError(f"Unknown header column: {h}")
+            headers.append(HEADER_MAP[key])
+
+        for row_values in reader:
+            if not any(v.strip() for v in row_values):
+                continue
+            row = dict(zip(headers, row_values))
+
+            # Checked before the template lookup so a bad row does not
+            # auto-create a template either
+            try:
+                course_code = norm_code(row["courseCode"])
+                name = row["name"].strip()
+                course_dates = parse_course_dates(
+                    row["startDate"],
+                    row["endDate"]
+                )
+                application_deadline = normalize_date(row.get("applicationDeadline", ""))
+                spots = int(row["spots"]) if row.get("spots") else None
+            except KeyError as e:
+                errors.append(f"line {reader.line_num}: missing column {e}")
+                continue
+            except ValueError as e:
+                errors.append(f"line {reader.line_num}: {e}")
+                continue
+
+            # --------------------------------------------
+            # TEMPLATE RESOLUTION
+            # --------------------------------------------
+            if course_code not in templates_by_code:
+                template = {
+                    "id": template_id_from_code(course_code),
+                    "courseCode": course_code,
+                    "name": name,
+                    "shortName": course_code,
+                    "category": row.get("category", "").strip(),
+                    "description": "",
+                    "targetAudience": "",
+                    "syllabus": "",
+                    "purpose": "",
+                    "learningObjectives": [],
+                    "finalGoal": "",
+                    "subGoals": [],
+                    "examination": "",
+                    "prerequisites": [],
+                    "literature": "",
+                    "additionalInfo": "Automatiskt skapad från kurstillfälle",
+                    "typicalDuration": "",
+                    "courseResponsible": "",
+                    "baseTemplateIds": [],
+                    "sourceFiles": [CSV_SOURCE],
+                    "lastModifiedBy": "csv-import",
+                    "lastModified": now_utc()
+                }
+                templates.append(template)
+                templates_by_code[course_code] = template
+
+            template_id = templates_by_code[course_code]["id"]
+
+            # --------------------------------------------
+            # EVENT CREATION
+            # --------------------------------------------
+            first_start = course_dates[0]["start"] if course_dates else "nodate"
+            event = {
+                "id": f"evt-{template_id}-{first_start}-{row.get('responsible', '').lower().replace(' ','')}-{row.get('location','').lower().replace(' ','')}",
+                "templateId": template_id,
+                # Kept per row so that exporting back to CSV is lossless even
+                # when the row's naming differs from the template
+                "courseName": name,
                 "category": row.get("category", "").strip(),
-                "description": "",
-                "targetAudience": "",
-                "syllabus": "",
-                "purpose": "",
-                "learningObjectives": [],
-                "finalGoal": "",
-                "subGoals": [],
-                "examination": "",
-                "prerequisites": [],
-                "literature": "",
-                "additionalInfo": "Automatiskt skapad från kurstillfälle",
-                "typicalDuration": "",
-                "courseResponsible": "",
-                "baseTemplateIds": [],
-                "sourceFiles": ["events.csv"],
+                "courseDates": course_dates,
+                "location": row.get("location", ""),
+                "eventResponsible": row.get("responsible", ""),
+                "applicationDeadline": application_deadline,
+                "spots": spots,
+                "status": "open",
+                "notes": row.get("notes", ""),
                 "lastModifiedBy": "csv-import",
-                "lastModified": now_utc()
+                "lastModified": now_utc(),
+                "sourceFiles": [CSV_SOURCE]
             }
-            templates.append(template)
-            templates_by_code[course_code] = template
 
-        template_id = templates_by_code[course_code]["id"]
+            events.append(event)
 
-        # --------------------------------------------
-        # EVENT CREATION
-        # --------------------------------------------
-        course_dates = parse_course_dates(
-            row["startDate"],
-            row["endDate"]
-        )
-        first_start = course_dates[0]["start"] if course_dates else "nodate"
-        event = {
-            "id": f"evt-{template_id}-{first_start}-{row.get('responsible', '').lower().replace(' ','')}-{row.get('location','').lower().replace(' ','')}",
-            "templateId": template_id,
-            "courseDates": course_dates,
-            "location": row.get("location", ""),
-            "eventResponsible": row.get("responsible", ""),
-            "applicationDeadline": normalize_date(row.get("applicationDeadline", "")),
-            "spots": int(row["spots"]) if row.get("spots") else None,
-            "status": "open",
-            "notes": row.get("notes", ""),
-            "lastModifiedBy": "csv-import",
-            "lastModified": now_utc(),
-            "sourceFiles": ["events.csv"]
-        }
+    return events, errors
+
+# ============================================================
+# DIFF
+# ============================================================
+
+VOLATILE_FIELDS = {"lastModified"}
+
+def same_event(a, b):
+    return (
+        {k: v for k, v in a.items() if k not in VOLATILE_FIELDS}
+        == {k: v for k, v in b.items() if k not in VOLATILE_FIELDS}
+    )
+
+def diff_events(previous, current):
+    """
+    Compares CSV-derived events by id. Unchanged events keep their previous
+    lastModified so that downstream consumers only see real edits.
+    """
+    previous_by_id = {e["id"]: e for e in previous}
+    current_ids = {e["id"] for e in current}
+
+    diff = {"added": [], "changed": [], "removed": [], "unchanged": 0}
+    merged = []
+
+    for event in current:
+        old = previous_by_id.get(event["id"])
+        if old is None:
+            diff["added"].append(event["id"])
+            merged.append(event)
+        elif same_event(old, event):
+            diff["unchanged"] += 1
+            merged.append(old)
+        else:
+            diff["changed"].append(event["id"])
+            merged.append(event)
+
+    diff["removed"] = [e["id"] for e in previous if e["id"] not in current_ids]
+
+    return merged, diff
+
+# ============================================================
+# IMPORT
+# ============================================================
+
+def import_tsv(tsv_file=TSV_FILE):
+    """
+    Re-imports the TSV and rewrites only what changed. Events from other
+    sources (e.g. scanned PDFs) are kept as they are.
+    """
+    with lock_for(TEMPLATE_OUTPUT), lock_for(EVENT_OUTPUT):
+        template_catalog = load_template_catalog()
+        template_count = len(template_catalog["templates"])
+
+        csv_events, errors = read_tsv_events(template_catalog, tsv_file)
+
+        if os.path.exists(EVENT_OUTPUT):
+            with open(EVENT_OUTPUT, encoding="utf-8") as f:
+                existing = json.load(f)["events"]
+        else:
+            existing = []
+
+        previous_csv = [e for e in existing if CSV_SOURCE in e.get("sourceFiles", [])]
+        other_events = [e for e in existing if CSV_SOURCE not in e.get("sourceFiles", [])]
 
-        events.append(event)
+        merged, diff = diff_events(previous_csv, csv_events)
+        diff["templatesAdded"] = len(template_catalog["templates"]) - template_count
+
+        if diff["added"] or diff["changed"] or diff["removed"]:
+            with open(EVENT_OUTPUT, "w", encoding="utf-8") as f:
+                json.dump({"events": merged + other_events}, f, ensure_ascii=False, indent=2)
+
+        if diff["templatesAdded"]:
+            with open(TEMPLATE_OUTPUT, "w", encoding="utf-8") as f:
+                json.dump(template_catalog, f, ensure_ascii=False, indent=2)
+
+    diff["errors"] = errors
+    diff["total"] = len(csv_events)
+    diff["templateTotal"] = len(template_catalog["templates"])
+    return diff
 
 # ============================================================
-# WRITE OUTPUTS
+# MAIN
 # ============================================================
 
-with open(EVENT_OUTPUT, "w", encoding="utf-8") as f:
-    json.dump({"events": events}, f, ensure_ascii=False, indent=2)
+def main():
+    diff = import_tsv()
+
+    for error in diff["errors"]:
+        print(f"[SKIPPED] {error}")
 
-with open(TEMPLATE_OUTPUT, "w", encoding="utf-8") as f:
-    json.dump(template_catalog, f, ensure_ascii=False, indent=2)
+    print(
+        f"[DONE] Imported {diff['total']} events "
+        f"(added {len(diff['added'])}, changed {len(diff['changed'])}, "
+        f"removed {len(diff['removed'])}, unchanged {diff['unchanged']})"
+    )
+    print(f"[DONE] Templates now total: {diff['templateTotal']}")
 
-print(f"[DONE] Imported {len(events)} events")
-print(f"[DONE] Templates now total: {len(templates)}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+
+# =========================
+# INCREMENTAL PARSER
+# =========================
+
+class StopStream(Exception):
+    """
+    Raised by a field callback to stop generation early.
+    """
+
+class IncrementalJsonParser:
+    """
+    Parses a model's JSON answer while it is still being generated.
+
+    Text before the first "{" or "null" (such as a ```json fence) is ignored.
+    Once the top-level value is known to be null, is_null is set. For an
+    object, feed() returns each top-level (key, value) pair as soon as its
+    value is complete, so callers can validate fields before the rest of
+    the object has been generated. Values that are not valid JSON are kept
+    as raw text in errors.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.start = None
+        self.is_null = False
+        self.done = False
+        self.fields = {}
+        self.errors = {}
+
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        completed = []
+
+        while self.pos < len(self.buffer) and not self.done:
+            c = self.buffer[self.pos]
+
+            if self.start is None:
+                if c == "{":
+                    self.start = self.pos
+                    self.depth = 1
+                elif self.buffer.startswith("null", self.pos):
+                    self.start = self.pos
+                    self.is_null = True
+                    self.done = True
+                    break
+                elif c == "n" and "null".startswith(self.buffer[self.pos:]):
+                    # Partial "nul" at the end of the buffer, wait for more
+                    break
+                self.pos += 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.key is None and self.key_start is not None:
+                        self.key = json.loads(self.buffer[self.key_start:self.pos + 1])
+                self.pos += 1
+                continue
+
+            if c == '"':
+                self.in_string = True
+                if self.depth == 1 and self.key is None:
+                    self.key_start = self.pos
+            elif c == ":" and self.depth == 1 and self.key is not None:
+                self.value_start = self.pos + 1
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._complete_field(completed)
+                    self.done = True
+            elif c == "," and self.depth == 1:
+                self._complete_field(completed)
+
+            self.pos += 1
+
+        return completed
+
+    def _complete_field(self, completed):
+        if self.key is not None and self.value_start is not None:
+            raw = self.buffer[self.value_start:self.pos]
+            try:
+                value = json.loads(raw)
+            except json.JSONDecodeError:
+                # Left for the caller to repair, e.g. a trailing comma
+                self.errors[self.key] = raw
+            else:
+                self.fields[self.key] = value
+                completed.append((self.key, value))
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+
+    def result(self):
+        if self.is_null:
+            return None
+        if self.start is None:
+            raise json.JSONDecodeError("No JSON value in response", self.buffer, 0)
+        if not self.done:
+            raise json.JSONDecodeError("Truncated JSON object", self.buffer, len(self.buffer))
+        return self.fields
+
+# =========================
+# STREAMED RESPONSES
+# =========================
+
+def stream_json(stream, on_field=None):
+    """
+    Consumes an OpenAI Responses stream through an IncrementalJsonParser.
+
+    on_field(key, value) is called for every completed top-level field and
+    may raise StopStream. Generation is also cut off as soon as the answer is
+    known to be null. Returns (parser, stopped), where stopped tells whether
+    the stream was closed early.
+    """
+    parser = IncrementalJsonParser()
+    stopped = False
+
+    try:
+        for event in stream:
+            if event.type != "response.output_text.delta":
+                continue
+
+            for key, value in parser.feed(event.delta):
+                if on_field:
+                    on_field(key, value)
+
+            if parser.done:
+                stopped = parser.is_null
+                break
+    except StopStream:
+        stopped = True
+    finally:
+        # Closing the HTTP response is what actually stops generation
+        stream.close()
+
+    return parser, stopped
@@ -0,0 +1,133 @@
+import time
+import threading
+
+from structured_output import GenerationFailed
+
+# =========================
+# CONFIG
+# =========================
+
+# Inputs longer than this go straight to the large model
+LONG_INPUT = 4000
+# Schema failures from one source before its items skip the small model
+FAILURE_ESCALATION = 3
+
+# =========================
+# RATE LIMIT
+# =========================
+
+class RateLimiter:
+    """
+    Spaces calls at least interval seconds apart across all threads that
+    share it, so scanning catalogs in parallel does not multiply the API
+    rate.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# =========================
+# ROUTER
+# =========================
+
+class Router:
+    """
+    Sends each item to no model, a small model or a large model, based on
+    cheap signals, and escalates to the next tier when the answer fails
+    validation (GenerationFailed). Keeps per-tier counts and latency.
+
+    tiers is a list of (name, model), cheapest first.
+    """
+
+    def __init__(self, tiers, long_input=LONG_INPUT, failure_escalation=FAILURE_ESCALATION):
+        self.tiers = list(tiers)
+        self.long_input = long_input
+        self.failure_escalation = failure_escalation
+        self.failures = {}
+        self.stats = {
+            name: {"items": 0, "calls": 0, "escalated": 0, "failed": 0, "seconds": 0.0}
+            for name in ["none"] + [name for name, _ in self.tiers]
+        }
+        # Catalogs are scanned in parallel threads by the pipeline
+        self.lock = threading.Lock()
+
+    def route(self, matched, dated, length, source=None, ambiguous=False, allow_none=True):
+        """
+        matched: a known template or course code was found in the input
+        dated: a date could be read from the input locally
+        length: input size in characters
+        source: where the input came from, for counting schema failures
+        ambiguous: the input names several templates
+        allow_none: whether items without either signal may skip the model
+        """
+        if allow_none and not matched and not dated:
+            tier = "none"
+        elif (
+            ambiguous
+            or length > self.long_input
+            or self.failures.get(source, 0) >= self.failure_escalation
+        ):
+            tier = self.tiers[-1][0]
+        else:
+            tier = self.tiers[0][0]
+
+        with self.lock:
+            self.stats[tier]["items"] += 1
+        return tier
+
+    def run(self, tier, call, source=None):
+        """
+        Calls call(model) from the given tier upwards until one answer passes
+        validation. Returns (result, model), or (None, None) for the "none"
+        tier and when every tier failed.
+        """
+        if tier == "none":
+            return None, None
+
+        names = [name for name, _ in self.tiers]
+        for n, (name, model) in enumerate(self.tiers[names.index(tier):]):
+            started = time.monotonic()
+            try:
+                result = call(model)
+            except GenerationFailed:
+                failed = True
+                result = None
+            else:
+                failed = False
+
+            with self.lock:
+                stats = self.stats[name]
+                stats["calls"] += 1
+                stats["seconds"] += time.monotonic() - started
+                if n:
+                    stats["escalated"] += 1
+                if failed:
+                    stats["failed"] += 1
+                    self.failures[source] = self.failures.get(source, 0) + 1
+
+            if not failed:
+                return result, model
+
+        return None, None
+
+    def summary(self):
+        parts = [f"none: {self.stats['none']['items']}"]
+        for name, model in self.tiers:
+            s = self.stats[name]
+            avg = s["seconds"] / s["calls"] if s["calls"] else 0.0
+            parts.append(
+                f"{name} ({model}): {s['items']} routed, {s['calls']} calls "
+                f"({s['escalated']} escalated), {s['failed']} failed, "
+                f"{s['seconds']:.1f}s total, {avg:.2f}s avg"
+            )
+        return " | ".join(parts)
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+PDF_DIR = "public/kurskataloger"
+TEXT_DIR = "extracted_text"
+STATE_FILE = ".pipeline_state.json"
+MAX_WORKERS = 4
+
+TEMPLATES_ALL = "data/hemvarn_course_templates_all.json"
+TEMPLATES_ENRICHED = "data/hemvarn_course_templates_enriched.json"
+TEMPLATE_SCHEMA = "data/course_template_schema.json"
+EVENTS = "data/hemvarn_course_events.json"
+TSV_FILE = "public/events.csv"
+API_MANIFEST = "public/api/manifest.json"
+EVENT_SCHEMA = "data/course_event_schema.json"
+
+# Helper modules the model-calling stages import
+MODEL_HELPERS = ["scripts/json_stream.py", "scripts/structured_output.py", "scripts/model_router.py"]
+
+# ============================================================
+# STAGES
+# ============================================================
+
+class Stage:
+    """
+    A unit of work with declared input and output files. A stage is skipped
+    when the content hashes of its inputs and outputs match the ones recorded
+    after its last successful run.
+    """
+
+    def __init__(self, name, run, inputs, outputs, deps=(), default=True):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.default = default
+        self.tracked_outputs = list(outputs)
+
+def run_command(*cmd):
+    def run():
+        subprocess.run(cmd, check=True)
+    return run
+
+def extract(pdf):
+    def run():
+        from extract_text import extract_pdf_text
+        extract_pdf_text(pdf, force=True)
+    return run
+
+def scan(pdf):
+    def run():
+        import create_events
+        create_events.rescan_pdf(pdf, force_extract=False)
+    return run
+
+def enrich():
+    import enrich_templates
+    enrich_templates.main()
+
+def import_tsv():
+    import import_events_from_tsv
+    import_events_from_tsv.import_tsv()
+
+def build_api():
+    import build_static_api
+    build_static_api.main()
+
+def build_stages():
+    pdfs = sorted(p for p in os.listdir(PDF_DIR) if p.lower().endswith(".pdf"))
+    texts = [os.path.join(TEXT_DIR, p.replace(".pdf", ".txt")) for p in pdfs]
+
+    stages = [
+        Stage(
+            "create_templates",
+            run_command(sys.executable, "scripts/create_templates.py"),
+            inputs=["scripts/create_templates.py"],
+            outputs=[TEMPLATES_ALL],
+        ),
+    ]
+
+    for pdf, txt in zip(pdfs, texts):
+        stages.append(Stage(
+            f"extract:{pdf}",
+            extract(pdf),
+            inputs=[os.path.join(PDF_DIR, pdf), "scripts/extract_text.py"],
+            outputs=[txt],
+        ))
+
+    stages.append(Stage(
+        "enrich_templates",
+        enrich,
+        inputs=[TEMPLATES_ALL, TEMPLATE_SCHEMA, "scripts/enrich_templates.py", "scripts/section_dedup.py"] + MODEL_HELPERS + texts,
+        outputs=[TEMPLATES_ENRICHED],
+        deps=["create_templates"] + [f"extract:{p}" for p in pdfs],
+    ))
+
+    stages.append(Stage(
+        "import_events_from_tsv",
+        import_tsv,
+        inputs=[TSV_FILE, TEMPLATES_ENRICHED, "scripts/import_events_from_tsv.py", "scripts/swedish_dates.py"],
+        outputs=[EVENTS, TEMPLATES_ENRICHED],
+        deps=["enrich_templates"],
+    ))
+
+    for pdf, txt in zip(pdfs, texts):
+        stages.append(Stage(
+            f"scan:{pdf}",
+            scan(pdf),
+            inputs=[txt, TEMPLATES_ENRICHED, EVENT_SCHEMA, "scripts/create_events.py", "scripts/swedish_dates.py"] + MODEL_HELPERS,
+            outputs=[EVENTS],
+            deps=["enrich_templates", f"extract:{pdf}"],
+        ))
+
+    event_stages = ["import_events_from_tsv"] + [f"scan:{p}" for p in pdfs]
+
+    stages.append(Stage(
+        "build_static_api",
+        build_api,
+        inputs=[TEMPLATES_ENRICHED, EVENTS, "scripts/build_static_api.py"],
+        outputs=[API_MANIFEST],
+        deps=event_stages,
+    ))
+
+    stages.append(Stage(
+        "db_import",
+        run_command("npm", "run", "db:import"),
+        inputs=[TEMPLATES_ENRICHED, EVENTS],
+        outputs=[],
+        deps=event_stages,
+        default=False,
+    ))
+
+    # Outputs written by several stages (the event file) change whenever any
+    # of them runs, so they only count as inputs for the stages that read them.
+    writers = {}
+    for s in stages:
+        for path in s.outputs:
+            writers[path] = writers.get(path, 0) + 1
+    for s in stages:
+        s.tracked_outputs = [p for p in s.outputs if writers[p] == 1]
+
+    return {s.name: s for s in stages}
+
+# ============================================================
+# UP-TO-DATE CHECKS
+# ============================================================
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(state):
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def fingerprint(stage, input_hashes=None):
+    """
+    Hashes of inputs (taken before the run, so edits made while the stage
+    was running trigger another run) and of outputs only this stage writes
+    (taken after).
+    """
+    hashes = {}
+    for path in stage.inputs:
+        if path in stage.outputs or input_hashes is None:
+            hashes[path] = file_hash(path)
+        else:
+            hashes[path] = input_hashes[path]
+    for path in stage.tracked_outputs:
+        hashes[path] = file_hash(path)
+    return hashes
+
+def up_to_date(stage, recorded):
+    if recorded is None:
+        return False
+    if any(not os.path.exists(p) for p in stage.outputs):
+        return False
+    return recorded == fingerprint(stage)
+
+# ============================================================
+# SCHEDULER
+# ============================================================
+
+def select(stages, targets):
+    """
+    The target stages plus everything they depend on.
+    """
+    selected = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name in selected:
+            continue
+        if name not in stages:
+            raise ValueError(f"Unknown stage: {name}")
+        selected.add(name)
+        todo.extend(stages[name].deps)
+    return selected
+
+def execute(stage, recorded, force):
+    started = time.monotonic()
+    input_hashes = {p: file_hash(p) for p in stage.inputs}
+
+    if not force and up_to_date(stage, recorded):
+        return "skipped", recorded, started, time.monotonic()
+
+    stage.run()
+    return "ran", fingerprint(stage, input_hashes), started, time.monotonic()
+
+def run_pipeline(stages, selected, force=False, max_workers=MAX_WORKERS):
+    state = load_state()
+    results = {}
+    pending = set(selected)
+    running = {}
+    t0 = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                deps = [d for d in stages[name].deps if d in selected]
+                if any(results.get(d, {}).get("status") in ("failed", "blocked") for d in deps):
+                    results[name] = {"status": "blocked", "start": 0.0, "end": 0.0}
+                    pending.discard(name)
+                elif all(d in results for d in deps):
+                    running[pool.submit(execute, stages[name], state.get(name), force)] = name
+                    pending.discard(name)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    status, state[name], start, end = future.result()
+                except Exception:
+                    print(f"[ERROR] {name}")
+                    traceback.print_exc()
+                    status, start, end = "failed", t0, time.monotonic()
+                results[name] = {"status": status, "start": start - t0, "end": end - t0}
+                print(f"[{status.upper()}] {name} ({end - start:.1f}s)", flush=True)
+
+            # Save after every stage so an interrupted run keeps its progress
+            save_state(state)
+
+    return results, time.monotonic() - t0
+
+# ============================================================
+# SUMMARY
+# ============================================================
+
+def critical_path(stages, results):
+    """
+    The dependency chain with the longest total duration.
+    """
+    longest = {}
+
+    def walk(name):
+        if name in longest:
+            return longest[name]
+        r = results[name]
+        own = r["end"] - r["start"]
+        best = (0.0, [])
+        for dep in stages[name].deps:
+            if dep in results:
+                best = max(best, walk(dep), key=lambda x: x[0])
+        longest[name] = (best[0] + own, best[1] + [name])
+        return longest[name]
+
+    return max((walk(n) for n in results), key=lambda x: x[0], default=(0.0, []))
+
+def print_summary(stages, results, wall):
+    print()
+    print(f"{'STAGE':<60} {'STATUS':<8} {'TIME':>8}")
+    for name, r in sorted(results.items(), key=lambda x: x[1]["start"]):
+        print(f"{name:<60} {r['status']:<8} {r['end'] - r['start']:>7.1f}s")
+
+    total, path = critical_path(stages, results)
+    busy = sum(r["end"] - r["start"] for r in results.values())
+
+    print()
+    print(f"Critical path ({total:.1f}s):")
+    for name in path:
+        r = results[name]
+        print(f"  {name} ({r['end'] - r['start']:.1f}s)")
+    print(f"Wall time {wall:.1f}s | stage time {busy:.1f}s | parallelism {busy / wall if wall else 0:.1f}x")
+
+    # Scan stages run in this process and share create_events' counters, so
+    # once every stage is done they cover all catalogs scanned in this run
+    create_events = sys.modules.get("create_events")
+    if create_events:
+        print()
+        print(f"[OUTPUT] {create_events.format_stats(create_events.OUTPUT_STATS)}")
+        print(f"[ROUTER] {create_events.ROUTER.summary()}")
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    stages = build_stages()
+
+    parser = argparse.ArgumentParser(description="Run the catalog pipeline, skipping up-to-date stages")
+    parser.add_argument("targets", nargs="*", help="stages to run (with their dependencies)")
+    parser.add_argument("--force", action="store_true", help="run stages even if up to date")
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS)
+    parser.add_argument("--list", action="store_true", help="list stages and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for s in stages.values():
+            print(f"{s.name}{'' if s.default else ' (opt-in)'} <- {', '.join(s.deps) or '-'}")
+        return
+
+    targets = args.targets or [s.name for s in stages.values() if s.default]
+    selected = select(stages, targets)
+
+    results, wall = run_pipeline(stages, selected, args.force, args.jobs)
+    print_summary(stages, results, wall)
+
+    if any(r["status"] in ("failed", "blocked") for r in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import os
+import re
+import random
+import hashlib
+from functools import lru_cache
+
+# =========================
+# CONFIG
+# =========================
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Estimated Jaccard at or above which two sections count as the same text
+DUPLICATE_THRESHOLD = 0.9
+# Below this an older section has no counterpart and is kept in full
+MATCH_THRESHOLD = 0.5
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_rng = random.Random(20250101)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+PAGE_MARKER = re.compile(r"^=== PAGE \d+ ===$", re.IGNORECASE)
+PAGE_NUMBER = re.compile(r"^\d+$")
+COURSE_MARKER = "kurskod:"
+
+# =========================
+# EDITIONS
+# =========================
+
+def edition_key(source_file):
+    """
+    Splits a catalog file name into (series, edition). Editions of the same
+    catalog only differ in their numbers, e.g. hvss-kurskatalog-2023.pdf and
+    hvss-kurskatalog-2025.pdf.
+    """
+    stem = os.path.splitext(source_file)[0].lower()
+    series = re.sub(r"\d+", "#", stem)
+    edition = tuple(int(n) for n in re.findall(r"\d+", stem))
+    return series, edition
+
+# =========================
+# SECTIONS
+# =========================
+
+def split_sections(text):
+    """
+    Splits catalog text into course sections. A section starts at the title
+    line just above a "Kurskod:" line. Catalogs without course headers fall
+    back to one section per page.
+    """
+    lines = text.splitlines()
+
+    if any(l.strip().startswith(COURSE_MARKER) for l in lines):
+        starts = [
+            max(i - 1, 0)
+            for i, l in enumerate(lines)
+            if l.strip().startswith(COURSE_MARKER)
+        ]
+        if starts[0] != 0:
+            starts.insert(0, 0)
+    else:
+        starts = [i for i, l in enumerate(lines) if PAGE_MARKER.match(l.strip())]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+
+    sections = []
+    for begin, end in zip(starts, starts[1:] + [len(lines)]):
+        body = [
+            l for l in lines[begin:end]
+            if not PAGE_MARKER.match(l.strip()) and not PAGE_NUMBER.match(l.strip())
+        ]
+        section = "\n".join(body).strip()
+        if section:
+            sections.append(section)
+
+    return sections
+
+def shingles(section):
+    words = re.findall(r"\w+", section.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[i:i + SHINGLE_WORDS])
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+# =========================
+# MINHASH
+# =========================
+
+def _hash(shingle):
+    return int.from_bytes(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little"
+    )
+
+def minhash(shingle_set):
+    hashes = [_hash(s) for s in shingle_set]
+    if not hashes:
+        return (MAX_HASH,) * NUM_PERM
+    return tuple(
+        min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+def similarity(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+def bands(signature):
+    return [
+        (band, signature[band * ROWS:(band + 1) * ROWS])
+        for band in range(BANDS)
+    ]
+
+class SectionIndex:
+    """
+    MinHash signatures of one catalog's sections, with an LSH band table for
+    finding the closest counterpart of a section from another edition.
+    """
+
+    def __init__(self, text):
+        self.sections = split_sections(text)
+        self.signatures = [minhash(shingles(s)) for s in self.sections]
+        self.buckets = {}
+        for i, sig in enumerate(self.signatures):
+            for key in bands(sig):
+                self.buckets.setdefault(key, []).append(i)
+
+    def best_match(self, signature):
+        candidates = set()
+        for key in bands(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        best, best_score = None, 0.0
+        for i in candidates:
+            score = similarity(signature, self.signatures[i])
+            if score > best_score:
+                best, best_score = i, score
+        return best, best_score
+
+    def find_course(self, keys):
+        """
+        Index of the section whose title or code line mentions one of keys.
+        Keys are tried in order, so pass the course code first.
+        """
+        headers = ["\n".join(s.splitlines()[:3]).lower() for s in self.sections]
+        for key in keys:
+            for i, header in enumerate(headers):
+                if key and key in header:
+                    return i
+        return None
+
+@lru_cache(maxsize=None)
+def load_index(txt_path, mtime):
+    # mtime is part of the cache key so re-extracted catalogs are re-indexed
+    with open(txt_path, encoding="utf-8") as f:
+        return SectionIndex(f.read().lower())
+
+def index_for(txt_path):
+    return load_index(txt_path, os.path.getmtime(txt_path))
+
+# =========================
+# COLLAPSE
+# =========================
+
+def section_diff(old, new):
+    new_lines = {l.strip() for l in new.splitlines()}
+    return "\n".join(l for l in old.splitlines() if l.strip() not in new_lines)
+
+def collapse_editions(indexes, course_keys):
+    """
+    indexes maps source file -> SectionIndex. Within each catalog series the
+    newest edition is kept in full; older editions only contribute sections
+    without a near-duplicate in the newest one (as a line diff when a close
+    counterpart exists).
+
+    Returns (text, changed) where changed is True when the course's own
+    section differs between editions of the same series.
+    """
+    series = {}
+    for source_file in indexes:
+        name, edition = edition_key(source_file)
+        series.setdefault(name, []).append((edition, source_file))
+
+    parts = []
+    changed = False
+
+    for name, editions in series.items():
+        editions.sort(reverse=True)
+        newest = indexes[editions[0][1]]
+        parts.append("\n\n".join(newest.sections))
+
+        newest_course = newest.find_course(course_keys)
+
+        for _, source_file in editions[1:]:
+            older = indexes[source_file]
+            kept = []
+
+            for section, signature in zip(older.sections, older.signatures):
+                match, score = newest.best_match(signature)
+                if score >= DUPLICATE_THRESHOLD:
+                    continue
+                if match is not None and score >= MATCH_THRESHOLD:
+                    diff = section_diff(section, newest.sections[match])
+                    if diff:
+                        kept.append(diff)
+                else:
+                    kept.append(section)
+
+            if kept:
+                parts.append(f"=== ÄLDRE UTGÅVA {source_file} (endast avvikelser) ===\n" + "\n\n".join(kept))
+
+            older_course = older.find_course(course_keys)
+            if newest_course is None or older_course is None:
+                if (newest_course is None) != (older_course is None):
+                    changed = True
+                continue
+
+            score = similarity(
+                newest.signatures[newest_course], older.signatures[older_course]
+            )
+            if score < DUPLICATE_THRESHOLD:
+                changed = True
+
+    return "\n\n".join(parts), changed
@@ -0,0 +1,248 @@
+import re
+import json
+import threading
+
+from json_stream import StopStream, stream_json
+
+# =========================
+# CONFIG
+# =========================
+
+MAX_REASKS = 2
+
+# Keywords OpenAI strict structured outputs do not accept
+UNSUPPORTED_KEYWORDS = {"$schema", "$id", "title", "default", "format"}
+
+# =========================
+# STRICT SCHEMAS
+# =========================
+
+def _strict(node):
+    if isinstance(node, list):
+        return [_strict(n) for n in node]
+    if not isinstance(node, dict):
+        return node
+
+    node = {k: _strict(v) for k, v in node.items() if k not in UNSUPPORTED_KEYWORDS}
+
+    # ["string", "array"] is not allowed in strict mode, anyOf is
+    types = node.get("type")
+    if isinstance(types, list) and "array" in types and len(types) > 1:
+        items = node.pop("items", {"type": "string"})
+        node.pop("type")
+        node["anyOf"] = [
+            {"type": t, "items": items} if t == "array" else {"type": t}
+            for t in types
+        ]
+
+    if node.get("type") == "object" and "properties" in node:
+        node["additionalProperties"] = False
+        node["required"] = list(node["properties"])
+
+    return node
+
+def strict_schema(schema, fields, extra=None):
+    """
+    An OpenAI strict JSON schema for a subset of schema's properties. Strict
+    mode wants every property required; optional values must be nullable.
+    extra adds properties that only exist in model output.
+    """
+    properties = dict(extra or {})
+    for field in fields:
+        properties[field] = schema["properties"][field]
+
+    return _strict({"type": "object", "properties": properties})
+
+def response_format(name, schema):
+    return {"format": {"type": "json_schema", "name": name, "schema": schema, "strict": True}}
+
+# =========================
+# LOCAL REPAIR
+# =========================
+
+FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+def _close_truncated(text):
+    """
+    Closes an unterminated string and any open brackets, dropping a dangling
+    key, colon or comma at the point where the output was cut off.
+    """
+    stack = []
+    in_string = False
+    escape = False
+
+    for c in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]" and stack:
+            stack.pop()
+
+    if escape:
+        text = text[:-1]
+    if in_string:
+        text += '"'
+
+    text = text.rstrip()
+    # "key": with no value, "key" with no colon, or a trailing comma
+    text = re.sub(r',?\s*"[^"]*"\s*:\s*$', "", text)
+    if stack and stack[-1] == "}":
+        text = re.sub(r',\s*"[^"]*"\s*$', "", text)
+    text = text.rstrip().rstrip(",")
+
+    return text + "".join(reversed(stack))
+
+def repair_json(text):
+    """
+    Best-effort local repair of a model answer: strips code fences and text
+    around the object, trailing commas and truncation. Raises
+    json.JSONDecodeError when nothing usable is left.
+    """
+    text = FENCE.sub("", text.strip())
+
+    start = text.find("{")
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object in response", text, 0)
+    text = text[start:]
+
+    end = text.rfind("}")
+    candidates = [text[:end + 1]] if end >= 0 else []
+    candidates.append(_close_truncated(text))
+
+    for candidate in candidates:
+        candidate = TRAILING_COMMA.sub(r"\1", candidate)
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+
+    raise json.JSONDecodeError("Could not repair response", text, 0)
+
+# =========================
+# GENERATION
+# =========================
+
+class FieldError(ValueError):
+    """
+    A field value the model can be asked to produce again.
+    """
+
+class GenerationFailed(Exception):
+    """
+    The model did not produce a valid object, even after re-asks.
+    """
+
+# Stats dicts are shared by the threads scanning catalogs in parallel
+_stats_lock = threading.Lock()
+
+def new_stats():
+    return {"clean": 0, "repaired": 0, "reasked": 0, "dropped": 0, "rejected": 0}
+
+def count(stats, key):
+    with _stats_lock:
+        stats[key] += 1
+
+def format_stats(stats):
+    return " | ".join(f"{k}: {v}" for k, v in stats.items())
+
+def reask_message(fields, errors):
+    lines = [
+        "Your previous answer was incomplete or had invalid values.",
+        "Return ONLY a JSON object with these fields: " + ", ".join(fields) + ".",
+    ]
+    for field, error in errors.items():
+        lines.append(f"- {field}: {error}")
+    return "\n".join(lines)
+
+def generate_object(start_stream, fields, check_field, stats, max_reasks=MAX_REASKS):
+    """
+    Streams an object from the model, field by field, and repairs what it
+    can locally before paying for another call.
+
+    start_stream(fields, followup) starts a response for the given fields;
+    followup is None for the first call and a re-ask message afterwards.
+    check_field(key, value) returns the cleaned value, raises FieldError for
+    a value worth asking for again, or StopStream to reject the whole answer.
+
+    Returns the object, or None if it was rejected. Raises GenerationFailed
+    if it could not be completed.
+    """
+    result = {}
+    wanted = list(fields)
+    followup = None
+    repaired = False
+
+    for attempt in range(max_reasks + 1):
+        errors = {}
+        rejected = []
+
+        def on_field(key, value):
+            if key not in wanted or key in result:
+                return
+            try:
+                result[key] = check_field(key, value)
+            except FieldError as e:
+                errors[key] = str(e)
+                raise StopStream()
+            except StopStream:
+                rejected.append(key)
+                raise
+
+        parser, stopped = stream_json(start_stream(wanted, followup), on_field)
+
+        if parser.is_null or rejected:
+            count(stats, "rejected")
+            return None
+
+        # Salvage complete fields the streaming parser could not read, or
+        # that were never passed on because the stream stopped, from a
+        # locally repaired copy of the answer. The field still being
+        # generated when it stopped is cut off (repair would close
+        # "Stockholm" as "Stock"), so it is asked for again instead.
+        if parser.errors or not parser.done:
+            partial = None if parser.done else parser.key
+            try:
+                salvaged = repair_json(parser.buffer)
+            except json.JSONDecodeError:
+                salvaged = {}
+
+            for key, value in salvaged.items():
+                if key not in wanted or key in result or key in errors or key == partial:
+                    continue
+                try:
+                    result[key] = check_field(key, value)
+                    repaired = True
+                except FieldError as e:
+                    errors[key] = str(e)
+                except StopStream:
+                    count(stats, "rejected")
+                    return None
+
+        missing = [f for f in wanted if f not in result]
+        if not missing:
+            if attempt:
+                count(stats, "reasked")
+            elif repaired:
+                count(stats, "repaired")
+            else:
+                count(stats, "clean")
+            return result
+
+        for field in missing:
+            errors.setdefault(field, "missing")
+        wanted = missing
+        followup = reask_message(missing, errors)
+
+    count(stats, "dropped")
+    raise GenerationFailed(f"still missing or invalid: {', '.join(wanted)}")
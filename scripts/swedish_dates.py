@@ -0,0 +1,312 @@
+import re
+import sys
+import json
+import argparse
+from datetime import date
+from functools import lru_cache
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+EVENT_FILE = "data/hemvarn_course_events.json"
+
+MONTHS = {
+    "jan": 1, "januari": 1,
+    "feb": 2, "februari": 2,
+    "mar": 3, "mars": 3,
+    "apr": 4, "april": 4,
+    "maj": 5,
+    "jun": 6, "juni": 6,
+    "jul": 7, "juli": 7,
+    "aug": 8, "augusti": 8,
+    "sep": 9, "sept": 9, "september": 9,
+    "okt": 10, "oktober": 10,
+    "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
+
+# Longest names first so "mars" is not read as "mar" + "s"
+MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+DASH = r"\s*[-–—]\s*"
+
+# 2026-09-01, 2026.09.01, 2026/09/01
+ISO = r"(20\d{2})[-./](\d{2})[-./](\d{2})"
+# 20260901
+COMPACT = r"(20\d{2})(\d{2})(\d{2})"
+
+PATTERNS = [
+    # 2026-09-01 - 2026-09-05, and the catalogs' "2025-02-07- -02-09"
+    ("iso_range", re.compile(
+        rf"\b{ISO}{DASH}(?:-\s*)?(?:(20\d{{2}})[-./])?(\d{{2}})[-./](\d{{2}})\b"
+    )),
+    ("iso", re.compile(rf"\b{ISO}\b")),
+    ("compact_range", re.compile(rf"\b{COMPACT}{DASH}{COMPACT}\b")),
+    ("compact", re.compile(rf"\b{COMPACT}\b")),
+    # 30 jan – 2 feb (2026)
+    ("day_month_range", re.compile(
+        rf"\b(\d{{1,2}})\s*({MONTH})\.?{DASH}(\d{{1,2}})\s*({MONTH})\.?(?:\s+(20\d{{2}})(?![-./]?\d))?\b",
+        re.IGNORECASE,
+    )),
+    # 3–7 mars (2026)
+    ("day_range", re.compile(
+        rf"\b(\d{{1,2}}){DASH}(\d{{1,2}})\s*({MONTH})\.?(?:\s+(20\d{{2}})(?![-./]?\d))?\b",
+        re.IGNORECASE,
+    )),
+    # 3 mars (2026)
+    ("day_month", re.compile(
+        rf"\b(\d{{1,2}})\s*({MONTH})\.?(?:\s+(20\d{{2}})(?![-./]?\d))?\b",
+        re.IGNORECASE,
+    )),
+    # v.39, v 39–41, vecka 39, and year-prefixed week codes like v506 (2025 w06)
+    ("week", re.compile(
+        r"\b(?:v\.?|vecka|veckorna)\s*(\d{1,4})(?:" + DASH + r"(?:v\.?\s*)?(\d{1,4}))?\b",
+        re.IGNORECASE,
+    )),
+]
+
+YEAR = re.compile(r"(?<!\d)20\d{2}(?!\d)")
+# An update or publication date in a file name, e.g. "uppdaterad 2025-12-11"
+NAME_DATE = re.compile(rf"(?<!\d){ISO}(?!\d)")
+
+# ============================================================
+# RESOLUTION
+# ============================================================
+
+def catalog_year(name):
+    """
+    The year a catalog is for, taken from its name. A year on its own wins
+    over the year of a full date, which is when the file was updated
+    ("kursutbud 2026 uppdaterad 2025-12-11.pdf" -> 2026); a name with only a
+    date falls back to that date's year.
+    """
+    name = name or ""
+    m = YEAR.search(NAME_DATE.sub(" ", name)) or YEAR.search(name)
+    return int(m.group()) if m else None
+
+@lru_cache(maxsize=None)
+def week_range(year, week):
+    """
+    Monday and Sunday of an ISO week.
+    """
+    return date.fromisocalendar(year, week, 1), date.fromisocalendar(year, week, 7)
+
+def week_code(code, year):
+    """
+    Resolves a week reference to (year, week). One or two digits are a week in
+    the catalog year; three or four digits carry the year's last digit(s) first,
+    as in the catalogs' "v506" (2025, week 6).
+    """
+    if len(code) <= 2:
+        if year is None:
+            raise ValueError(f"Week {code} needs a catalog year")
+        return year, int(code)
+
+    digits = len(code) - 2
+    base = year or date.today().year
+    tail = int(code[:digits])
+    full = base - base % 10 ** digits + tail
+    # Pick the decade (or century) closest to the catalog year
+    if full - base > 10 ** digits // 2:
+        full -= 10 ** digits
+    elif base - full > 10 ** digits // 2:
+        full += 10 ** digits
+    return full, int(code[digits:])
+
+def day(year, month, d):
+    if year is None:
+        raise ValueError("Date without year needs a catalog year")
+    return date(int(year), int(month), int(d))
+
+def resolve(kind, g, year):
+    """
+    (start, end) dates for one pattern match.
+    """
+    if kind == "iso_range":
+        start = day(g[0], g[1], g[2])
+        end = day(g[3] or start.year, g[4], g[5])
+        # 2025-12-30- -01-02 runs into the next year
+        if not g[3] and end < start:
+            end = end.replace(year=end.year + 1)
+        return start, end
+
+    if kind in ("iso", "compact"):
+        d = day(g[0], g[1], g[2])
+        return d, d
+
+    if kind == "compact_range":
+        return day(g[0], g[1], g[2]), day(g[3], g[4], g[5])
+
+    if kind == "day_month_range":
+        y = int(g[4]) if g[4] else year
+        start = day(y, MONTHS[g[1].lower()], g[0])
+        end = day(y, MONTHS[g[3].lower()], g[2])
+        # 28 dec – 3 jan: the year is given for (or assumed from) the start
+        if end < start:
+            end = end.replace(year=end.year + 1)
+        return start, end
+
+    if kind == "day_range":
+        y = int(g[3]) if g[3] else year
+        month = MONTHS[g[2].lower()]
+        return day(y, month, g[0]), day(y, month, g[1])
+
+    if kind == "day_month":
+        y = int(g[2]) if g[2] else year
+        d = day(y, MONTHS[g[1].lower()], g[0])
+        return d, d
+
+    if kind == "week":
+        first = week_code(g[0], year)
+        start = week_range(*first)[0]
+        if not g[1]:
+            return start, week_range(*first)[1]
+
+        last = week_code(g[1], first[0])
+        # v 50–2 runs into the next year
+        if len(g[1]) <= 2 and last[1] < first[1]:
+            last = (last[0] + 1, last[1])
+        return start, week_range(*last)[1]
+
+    raise ValueError(f"Unknown date pattern {kind}")
+
+# ============================================================
+# PARSING
+# ============================================================
+
+def compact(d):
+    return d.strftime("%Y%m%d")
+
+def find_dates(text, year=None, kinds=None):
+    """
+    All dates and date ranges in text, in order, as {start, end} dicts in
+    YYYYMMDD. Each stretch of text is matched by the most specific pattern
+    only, so "3–7 mars" is one range and not also "7 mars". Matches that do
+    not resolve to a real date (e.g. "v 54", "31 feb") are skipped.
+    """
+    taken = []
+    found = []
+
+    for kind, pattern in PATTERNS:
+        for m in pattern.finditer(text):
+            if any(m.start() < e and s < m.end() for s, e in taken):
+                continue
+            taken.append((m.start(), m.end()))
+            if kinds and kind not in kinds:
+                continue
+            try:
+                start, end = resolve(kind, m.groups(), year)
+            except ValueError:
+                continue
+            if end < start:
+                continue
+            found.append((m.start(), {"start": compact(start), "end": compact(end)}))
+
+    found.sort(key=lambda x: x[0])
+
+    result = []
+    for _, d in found:
+        if d not in result:
+            result.append(d)
+    return result
+
+# Patterns that describe a whole course period rather than a single day
+RANGE_KINDS = {"iso_range", "compact_range", "day_month_range", "day_range", "week"}
+
+def find_course_dates(text, year=None):
+    """
+    Date ranges in text. Lone dates are left out: in catalog rows they are
+    as likely to be an application deadline as a course day.
+    """
+    return find_dates(text, year, RANGE_KINDS)
+
+def normalize_date(s, year=None):
+    """
+    One date in any supported form as YYYYMMDD. Empty input stays empty;
+    anything else that is not exactly one valid date raises ValueError.
+    """
+    if s is not None and not isinstance(s, str):
+        raise ValueError(f"Not a date: {s!r}")
+    s = (s or "").strip()
+    if not s:
+        return ""
+
+    found = find_dates(s, year, {"iso", "compact", "day_month"})
+    if len(found) != 1 or found[0]["start"] != found[0]["end"]:
+        raise ValueError(f"Not a date: {s!r}")
+    return found[0]["start"]
+
+# ============================================================
+# VALIDATION
+# ============================================================
+
+def date_error(value):
+    if not isinstance(value, str) or not re.fullmatch(r"\d{8}", value):
+        return f"{value!r} is not YYYYMMDD"
+    try:
+        date(int(value[:4]), int(value[4:6]), int(value[6:]))
+    except ValueError:
+        return f"{value!r} is not a calendar date"
+    return None
+
+def course_date_errors(course_dates):
+    """
+    Problems with a courseDates list; empty when it is valid.
+    """
+    if not isinstance(course_dates, list):
+        return [f"courseDates must be a list, got {course_dates!r}"]
+
+    errors = []
+    for d in course_dates:
+        if not isinstance(d, dict):
+            errors.append(f"{d!r} is not a {{start, end}} object")
+            continue
+        problems = [e for e in (date_error(d.get("start")), date_error(d.get("end"))) if e]
+        if problems:
+            errors += problems
+        elif d["end"] < d["start"]:
+            errors.append(f"{d['start']}-{d['end']} ends before it starts")
+    return errors
+
+def check_events(events):
+    """
+    Validates courseDates and applicationDeadline of many events at once.
+    Returns {event id: [errors]} for the events with problems.
+    """
+    problems = {}
+    for event in events:
+        errors = course_date_errors(event.get("courseDates"))
+        deadline = event.get("applicationDeadline")
+        if deadline:
+            e = date_error(deadline)
+            if e:
+                errors.append(f"applicationDeadline {e}")
+        if errors:
+            problems[event.get("id")] = errors
+    return problems
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse Swedish catalog dates or check event dates")
+    parser.add_argument("text", nargs="*", help="text to parse, e.g. '3–7 mars' or 'v 39–41'")
+    parser.add_argument("--year", type=int, help="catalog year for dates and weeks without one")
+    parser.add_argument("--check", nargs="?", const=EVENT_FILE, help="validate the dates of an event file")
+    args = parser.parse_args()
+
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            events = json.load(f)["events"]
+        problems = check_events(events)
+        for event_id, errors in problems.items():
+            print(f"[INVALID] {event_id}: {'; '.join(errors)}")
+        print(f"[DONE] Checked {len(events)} events, {len(problems)} with invalid dates")
+        sys.exit(1 if problems else 0)
+
+    for text in args.text:
+        print(f"{text} -> {json.dumps(find_dates(text, args.year))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import json
+import sys
+import time
+import traceback
+from datetime import datetime
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+PDF_DIR = "public/kurskataloger"
+TSV_FILE = "public/events.csv"
+
+POLL_SECONDS = 1.0
+DEBOUNCE_SECONDS = 2.0
+
+# ============================================================
+# UTILITIES
+# ============================================================
+
+def now_local():
+    return datetime.now().strftime("%H:%M:%S")
+
+def log(msg):
+    print(f"[{now_local()}] {msg}", flush=True)
+
+# ============================================================
+# SNAPSHOT
+# ============================================================
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def snapshot():
+    """
+    Maps every watched path to (mtime, size). Cheap enough to poll every
+    second for a handful of catalogs.
+    """
+    snap = {}
+    try:
+        entries = list(os.scandir(PDF_DIR))
+    except OSError:
+        entries = []
+
+    for entry in entries:
+        # A catalog deleted or renamed since the scandir is simply gone
+        try:
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                st = entry.stat()
+                snap[entry.path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            continue
+
+    sig = file_signature(TSV_FILE)
+    if sig:
+        snap[TSV_FILE] = sig
+
+    return snap
+
+def changed_paths(before, after):
+    return {
+        path
+        for path in before.keys() | after.keys()
+        if before.get(path) != after.get(path)
+    }
+
+# ============================================================
+# HANDLERS
+# ============================================================
+
+def handle_pdf(path):
+    # Imported lazily: CSV-only sessions should not need an OpenAI key.
+    import create_events
+
+    pdf = os.path.basename(path)
+    if os.path.exists(path):
+        log(f"Scanning {pdf}")
+    else:
+        log(f"Removing events from {pdf}")
+
+    stats = create_events.rescan_pdf(pdf)
+    log(
+        f"[DONE] {pdf}: candidates {stats['candidates']} | "
+        f"accepted {stats['accepted']}"
+    )
+    log(f"[OUTPUT] {stats['output']}")
+    log(f"[ROUTER] {stats['router']}")
+
+def handle_tsv(path):
+    import import_events_from_tsv
+
+    if not os.path.exists(path):
+        log(f"{path} removed, keeping existing events")
+        return
+
+    diff = import_events_from_tsv.import_tsv(path)
+    for error in diff["errors"]:
+        log(f"[SKIPPED] {os.path.basename(path)} {error}")
+    log(
+        f"[DONE] {os.path.basename(path)}: added {len(diff['added'])}, "
+        f"changed {len(diff['changed'])}, removed {len(diff['removed'])}, "
+        f"templates added {diff['templatesAdded']}"
+    )
+
+def rebuild_api():
+    import build_static_api
+
+    with open(build_static_api.TEMPLATE_FILE, encoding="utf-8") as f:
+        templates = json.load(f)["templates"]
+    with open(build_static_api.EVENT_FILE, encoding="utf-8") as f:
+        events = json.load(f)["events"]
+
+    stats = build_static_api.build(templates, events)
+    log(
+        f"[DONE] API: written {stats['written']} | "
+        f"unchanged {stats['unchanged']} | removed {stats['removed']}"
+    )
+
+def dispatch(paths):
+    # The CSV import is quick, so its edits show up before slow PDF scans.
+    for path in sorted(paths, key=lambda p: p != TSV_FILE):
+        try:
+            if path == TSV_FILE:
+                handle_tsv(path)
+            else:
+                handle_pdf(path)
+        except Exception:
+            log(f"[ERROR] {path}")
+            traceback.print_exc()
+
+    try:
+        rebuild_api()
+    except Exception:
+        log("[ERROR] API rebuild")
+        traceback.print_exc()
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    current = snapshot()
+    pending = set()
+    last_change = 0.0
+
+    log(f"Watching {PDF_DIR} and {TSV_FILE} ({len(current)} files)")
+
+    while True:
+        time.sleep(POLL_SECONDS)
+
+        # The watcher is a long-running daemon: log anything unexpected and
+        # keep polling rather than exit
+        try:
+            latest = snapshot()
+            changes = changed_paths(current, latest)
+            current = latest
+
+            if changes:
+                pending |= changes
+                last_change = time.monotonic()
+                continue
+
+            # Wait until writers have been quiet for a while, so a PDF that is
+            # still being copied or a CSV mid-save is not picked up half-done.
+            if pending and time.monotonic() - last_change >= DEBOUNCE_SECONDS:
+                batch, pending = pending, set()
+                dispatch(batch)
+        except Exception:
+            log("[ERROR] watch loop")
+            traceback.print_exc()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(0)
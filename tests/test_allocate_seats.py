@@ -0,0 +1,42 @@
+import json
+import os
+
+import allocate_seats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_templates():
+    with open(os.path.join(ROOT, allocate_seats.TEMPLATE_FILE), encoding="utf-8") as f:
+        return json.load(f)["templates"]
+
+def test_role_scoped_prerequisites_are_alternatives():
+    # "Genomförd plutonchefskurs 1 för troppchefer." and "Genomförd
+    # gruppchefskurs x alternativt gruppchefskurs 1 för gruppchefer."
+    clauses = allocate_seats.prerequisite_clauses(load_templates())
+
+    assert clauses["troppchef-stab-tross"] == [{"plutonchef-1", "gruppchef-x", "gruppchef-1"}]
+
+def test_lone_role_scoped_prerequisite_is_skipped():
+    # "För kompanikvartermästare: genomförd plutonchefskurs 1."
+    clauses = allocate_seats.prerequisite_clauses(load_templates())
+
+    assert clauses["kvartermästarkurs-1"] == []
+
+def test_member_meeting_own_role_line_gets_seat():
+    templates = load_templates()
+    events = [{
+        "id": "evt-troppchef-stab-tross",
+        "templateId": "troppchef-stab-tross",
+        "courseDates": [{"start": "20260301", "end": "20260305"}],
+        "spots": 2,
+        "status": "open",
+    }]
+    applications = [
+        {"member": "gruppchef", "choices": ["evt-troppchef-stab-tross"], "completed": ["gruppchef-1"]},
+        {"member": "nybörjare", "choices": ["evt-troppchef-stab-tross"], "completed": []},
+    ]
+
+    result = allocate_seats.allocate(applications, events, templates, round_date="20260101")
+
+    assert [a["member"] for a in result["allocations"]] == ["gruppchef"]
+    assert result["stats"]["rejectedChoices"] == {"prerequisites": 1}
@@ -0,0 +1,11 @@
+from swedish_dates import catalog_year
+
+def test_catalog_year_ignores_update_date():
+    assert catalog_year("SK Hv kursutbud 2026 uppdaterad 2025-12-11.pdf") == 2026
+    assert catalog_year("hvss-kursutbud-2026-uppdaterad-2025-10-14.pdf") == 2026
+
+def test_catalog_year_falls_back_to_update_date():
+    assert catalog_year("SK Hv Gemensam kurskatalog uppdaterad 2025-12-11.pdf") == 2025
+
+def test_catalog_year_without_year():
+    assert catalog_year("05 MRS UTBKAT25-27 Bilaga D MRS kurser v25.2.pdf") is None